@@ -0,0 +1,60 @@
+import sys
+import time
+from bs4 import BeautifulSoup
+
+from scripts import extractor
+
+# Reference implementation: the original full-DOM html.parser scan
+def legacy_parse_table(content):
+    soup = BeautifulSoup(content, "html.parser")
+
+    tables = soup.find_all("table")
+    for table in tables:
+        rows = table.find_all("tr")
+        for tr in rows:
+            if "iPhone" in tr.get_text():
+                data = []
+                for tr in rows:
+                    cols = [td.get_text(strip=True).replace("　", "") for td in tr.find_all(["td", "th"])]
+                    if any(cols):
+                        data.append(cols)
+                return data
+
+    raise ValueError("❌ Could not find a pricing table containing 'iPhone'.")
+
+def best_time(func, content, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def bench_page(name, content, repeat=3):
+    legacy_s, legacy_rows = best_time(legacy_parse_table, content, repeat)
+    fast_s, fast_rows = best_time(extractor.parse_table, content, repeat)
+
+    # Both engines must agree row for row
+    same = [list(row) for row in fast_rows] == legacy_rows
+    speedup = legacy_s / fast_s if fast_s > 0 else float("inf")
+    print(
+        f"{'✅' if same else '❌'} {name}: {len(content) / 1e6:.1f} MB, {len(fast_rows)} rows | "
+        f"legacy {legacy_s:.3f}s, {extractor.HTML_PARSER} {fast_s:.3f}s ({speedup:.1f}x)"
+    )
+    return same
+
+def main(paths):
+    if not paths:
+        print("Usage: python -m benchmarks.extractor_parse page.html [page.html ...]")
+        return 1
+
+    ok = True
+    for path in paths:
+        with open(path, "rb") as f:
+            ok = bench_page(path, f.read()) and ok
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,187 @@
+import html
+import random
+import sys
+
+from scripts import filer
+
+# Multipliers over a typical day's list (scale 1 is roughly the size of the live page)
+SCALES = {"1x": 1, "10x": 10, "100x": 100}
+
+COLORS = ["Black", "White", "Desert", "Blue", "Natural", "Red", "Gold", "Silver"]
+
+def header(name):
+    # Section headers are emitted exactly as filer expects them, newlines included
+    return [name]
+
+def iphone_new_rows(r, scale):
+    out = [header(filer.section_headers[0])]
+    models = ["16 Pro Max", "16 Pro", "16 Plus", "16", "16e", "15 Pro Max", "15 Pro", "15 Plus", "15", "14", "13"]
+    storages = ["128GB", "256GB", "512GB", "1TB"]
+
+    # Unlocked block: price rows, with the odd Red modifier in the notes column
+    out.append(["iPhone Unlocked", "Sealed", "Open Box", "Note"])
+    for k in range(scale):
+        for model in models:
+            for storage in storages[:3]:
+                color = r.choice(COLORS)
+                price = r.randint(450, 1500)
+                note = f"Red -${r.randint(5, 40)}" if r.random() < 0.15 else ""
+                suffix = f" R{k}" if k else ""
+                out.append([f"iPhone {model} {storage} {color}{suffix}", f"${price}", f"${price - r.randint(10, 60)}", note])
+
+    # Locked block: Flex/Cricket modifiers sit on their own rows and carry forward
+    out.append(["iPhone Locked", "Sealed", "Open Box", f"Flex +${r.randint(5, 30)}"])
+    out.append(["", "", "", f"Cricket -${r.randint(10, 40)}"])
+    for k in range(scale):
+        for model in models[:7]:
+            for storage in storages[1:]:
+                price = r.randint(400, 1300)
+                suffix = f" R{k}" if k else ""
+                out.append([f"iPhone {model} {storage}{suffix}", f"${price}", f"${price - r.randint(20, 80)}", ""])
+                if r.random() < 0.1:
+                    out.append(["", "", "", f"Flex +${r.randint(5, 40)}"])
+                if r.random() < 0.05:
+                    out.append(["", "", "", f"Cricket -${r.randint(5, 40)}"])
+    out.append(["Payment by Bank Wire / PayPal / USDT only"])
+    return out
+
+def samsung_rows(r, scale):
+    out = [header(filer.section_headers[4])]
+    out.append(["Model", "Sealed", "A+", "B/B+", "C", "D/D+", "E"])
+    models = ["S25 Ultra", "S25+", "S25", "S24 Ultra", "S24+", "S24 FE", "S23 Ultra", "Z Fold6", "Z Flip6", "A55"]
+    carriers = ["Unlocked", "Verizon", "VerizonT-Mobile", "AT&T", "Xfinity Sprint", "T-Mobile", ""]
+    for k in range(scale):
+        for model in models:
+            for storage in ["128GB", "256GB", "512GB"]:
+                carrier = r.choice(carriers)
+                prices = [f"${r.randint(80, 1100)}" if r.random() > 0.15 else r.choice(["", "N/A", "-"]) for _ in range(6)]
+                suffix = f" R{k}" if k else ""
+                out.append([f"{model} {storage} {carrier}".strip() + suffix] + prices)
+        out.append(["rgb(228, 228, 228) divider"])
+    return out
+
+def ipad_rows(r, scale):
+    out = [header(filer.section_headers[2])]
+    out.append(["Model", "Sealed", "Open", "A", "B", "C", "D"])
+    models = ["iPad Pro 13 M4", "iPad Pro 11 M4", "iPad Air 13 M2", "iPad Air 11 M2", "iPad mini 7", "iPad 10th Gen"]
+    for k in range(scale):
+        for model in models:
+            for storage in ["128GB", "256GB", "512GB"]:
+                cellular = " Verizon" if r.random() < 0.3 else ""
+                prices = [f"${r.randint(150, 1200)}" if r.random() > 0.15 else "" for _ in range(6)]
+                suffix = f" R{k}" if k else ""
+                out.append([f"{model} {storage}{cellular}{suffix}"] + prices)
+    out.append(["model iPads Wifi only"])
+    return out
+
+def macbook_rows(r, scale):
+    out = [header(filer.section_headers[3])]
+    out.append(["Model", "Sealed", "Open", "A/B", "MDM"])
+    models = ["MacBook Pro 16 M4 Max", "MacBook Pro 14 M4 Pro", "MacBook Pro 14 M3", "MacBook Air 15 M3", "MacBook Air 13 M2"]
+    for k in range(scale):
+        for model in models:
+            suffix = f" R{k}" if k else ""
+            out.append([model + suffix])
+            for storage in ["512GB", "1TB", "2TB"]:
+                # Several serial numbers share one price row
+                serials = " ".join(f"MX{r.randint(100, 999)}LL{k}" for _ in range(r.randint(1, 5)))
+                prices = [f"${r.randint(600, 3200)}" for _ in range(4)]
+                if r.random() < 0.3:
+                    out.append([f"{storage} - {serials}", ""] + prices)
+                else:
+                    out.append([f"{storage} - {serials}"] + prices)
+        out.append(["rgb(224, 233, 243) divider"])
+    return out
+
+def google_rows(r, scale):
+    out = [header(filer.section_headers[5])]
+    out.append(["Model", "Sealed", "Open", "A+", "B/B+"])
+    models = ["Pixel 9 Pro XL", "Pixel 9 Pro", "Pixel 9", "Pixel 8 Pro", "Pixel 8a", "Pixel 7a"]
+    for k in range(scale):
+        for model in models:
+            for storage in ["128GB", "256GB"]:
+                lock = r.choice(["Unlocked", "Locked", ""])
+                prices = [f"${r.randint(100, 900)}" if r.random() > 0.1 else "" for _ in range(4)]
+                suffix = f" R{k}" if k else ""
+                out.append([f"{model} {storage} {lock}".strip() + suffix] + prices)
+    return out
+
+def others_rows(r, scale):
+    out = [header(filer.section_headers[1])]
+    for k in range(scale):
+        for item in ["AirPods Pro 2", "AirPods 4", "Apple Watch Ultra 2", "Apple Watch S10 46mm"]:
+            out.append([f"{item} R{k}" if k else item, f"${r.randint(80, 700)}"])
+    return out
+
+def iphone_used_rows(r, scale):
+    out = [header(filer.section_headers[7])]
+    out.append(["Used", "A+", "B+", "B", "C", "D", "HSO/Swap"])
+    out.append(["Grade Explanation", "like new", "light wear", "wear", "heavy wear", "cracked", "swap"])
+    models = ["iPhone 16 Pro Max", "iPhone 16 Pro", "iPhone 15 Pro Max", "iPhone 15 Pro", "iPhone 15",
+              "iPhone 14 Pro", "iPhone 14", "iPhone 13", "iPhone 13 mini", "iPhone 12"]
+    for k in range(scale):
+        for model in models:
+            for storage in ["128GB", "256GB"]:
+                for lock in ["Unlocked", "Locked"]:
+                    if lock == "Locked" and r.random() < 0.4:
+                        out.append([f"Flex +${r.randint(5, 30)}", f"Cricket -${r.randint(5, 30)}"])
+                    prices = [f"${r.randint(60, 1000)}" for _ in range(6)]
+                    suffix = f" R{k}" if k else ""
+                    out.append([f"{model} {storage} {lock}{suffix}"] + prices)
+    return out
+
+def icloud_rows(r, scale):
+    out = [header(filer.section_headers[6])]
+    for k in range(scale):
+        for model in ["iPhone 15 Pro", "iPhone 14", "iPhone 13"]:
+            out.append([f"{model} 128GB R{k}" if k else f"{model} 128GB"] + [f"${r.randint(20, 300)}" for _ in range(6)])
+    return out
+
+def generate_rows(scale=1, seed=7):
+    # Rows of the pricing table, in the order the live page lists its sections
+    r = random.Random(seed)
+    rows = [
+        ["Hanggroup Price List - Kwun Tong Office, Hong Kong"],
+        ["WhatsApp +852 0000 0000", "Telegram @hanggroup"],
+        ["Minor Price Update 10:30"],
+    ]
+    for section in (iphone_new_rows, samsung_rows, ipad_rows, macbook_rows, google_rows,
+                    others_rows, iphone_used_rows, icloud_rows):
+        rows.extend(section(r, scale))
+    rows.append(["We DONT accept Fedex shipments from NY"])
+    return rows
+
+def cell_html(text):
+    # Mailchimp wraps cell text in styled spans; blank cells hold an ideographic space
+    if not text:
+        return "<td style=\"border:1px solid #ccc\">　</td>"
+    return f"<td style=\"border:1px solid #ccc\"><span style=\"font-size:12px\"><strong>{html.escape(text)}</strong></span></td>"
+
+def generate_page(scale=1, seed=7):
+    # A Mailchimp campaign page: a text block, then the pricing table with its spacer rows
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset=\"UTF-8\"><title>Hanggroup Price List</title>",
+        "<style>td{font-family:Arial}</style><script>var mc = {};</script></head><body>",
+        "<table class=\"mcnTextBlock\"><tr><td><p>Daily wholesale price list.</p></td></tr></table>",
+        "<table class=\"mcnTableBlock\" border=\"1\">",
+    ]
+    for row in generate_rows(scale, seed):
+        parts.append("<tr>" + "".join(cell_html(cell) for cell in row) + "</tr>")
+        parts.append("<tr><td>　</td></tr>")
+    parts.append("</table></body></html>")
+    return "\n".join(parts).encode("utf-8")
+
+def main(args):
+    # python -m benchmarks.generator 10x page.html
+    if len(args) != 2 or args[0] not in SCALES:
+        print(f"Usage: python -m benchmarks.generator {{{'|'.join(SCALES)}}} output.html")
+        return 1
+
+    content = generate_page(SCALES[args[0]])
+    with open(args[1], "wb") as f:
+        f.write(content)
+    print(f"✅ Wrote {args[0]} price list ({len(content) / 1e6:.1f} MB) to {args[1]}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,185 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+import pandas as pd
+
+from benchmarks import generator
+from scripts import cleaner
+from scripts import extractor
+from scripts import filer
+from scripts import google_phones
+from scripts import ipad
+from scripts import iphone_new
+from scripts import iphone_used
+from scripts import loader
+from scripts import macbook
+from scripts import samsung
+from scripts import sinks
+from scripts import snapshots
+
+PROCESSORS = [iphone_new, samsung, ipad, google_phones, macbook, iphone_used]
+GOLDEN_FILE = os.path.join(os.path.dirname(__file__), "golden.json")
+
+# Shadows the real devices table for the length of the benchmark transaction
+STAND_IN_DDL = """
+CREATE TEMP TABLE devices (
+    box_status text, category text, make text, model text, storage text, color text,
+    grade text, lock_status text, active_status text, carrier text, price numeric,
+    serial_number text, fetched_at date
+) ON COMMIT DROP
+"""
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def canonical_csv(df):
+    # Dtype-independent text form of a processor output: strings as written, prices as floats
+    df = pd.read_csv(io.StringIO(df.to_csv(index=False)), dtype=str)
+    for col in df.columns:
+        if col.lower() == "price":
+            df[col] = df[col].astype(float)
+    return df.to_csv(index=False)
+
+def digest(df):
+    return hashlib.sha256(canonical_csv(df).encode("utf-8")).hexdigest()
+
+def load_golden():
+    if not os.path.exists(GOLDEN_FILE):
+        return {}
+    with open(GOLDEN_FILE) as f:
+        return json.load(f)
+
+def report(stage, elapsed, rows):
+    rate = rows / elapsed if elapsed > 0 else float(rows)
+    print(f"   {stage:<28} {elapsed:8.3f}s  {rows:>9,} rows  ({rate:,.0f} rows/sec)")
+
+def run_stages(content):
+    # Times every stage on one page and returns the processor outputs keyed by OUTPUT_FILE
+    rows, elapsed = timed(extractor.parse_table, content)
+    report(f"extractor ({extractor.HTML_PARSER})", elapsed, len(rows))
+
+    raw = extractor.to_frame(rows)
+    (cleaned, dropped), elapsed = timed(cleaner.filter_rows, raw)
+    report("cleaner", elapsed, len(raw))
+
+    sections, elapsed = timed(filer.split_sections, cleaned)
+    report("filer", elapsed, len(cleaned))
+
+    outputs = {}
+    for module in PROCESSORS:
+        section = sections.get(module.SECTION)
+        if section is None:
+            print(f"   ❌ Section not found: {module.SECTION}")
+            continue
+        outputs[module.OUTPUT_FILE], elapsed = timed(module.process, section)
+        report(module.__name__.rsplit(".", 1)[-1], elapsed, len(outputs[module.OUTPUT_FILE]))
+    return outputs
+
+def run_loader(outputs, database_url, modes):
+    # Loads every output into a temporary devices table and rolls back, leaving the database untouched
+    import psycopg2
+    import run_pipeline
+
+    frames = [run_pipeline.prepare_frame(df, date.today()) for df in outputs.values()]
+    rows = sum(len(df) for df in frames)
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(STAND_IN_DDL)
+            for mode in modes:
+                start = time.perf_counter()
+                for df in frames:
+                    loader.load_frame(cursor, df, mode)
+                report(f"loader ({mode})", time.perf_counter() - start, rows)
+    finally:
+        conn.rollback()
+        conn.close()
+
+def run_sinks(outputs, names):
+    # Writes every output to each local sink in a throwaway directory
+    import run_pipeline
+
+    frames = {name: run_pipeline.prepare_frame(df, date.today()) for name, df in outputs.items()}
+    rows = sum(len(df) for df in frames.values())
+    with tempfile.TemporaryDirectory() as tmp:
+        targets = {"sqlite": {"path": os.path.join(tmp, "bench.sqlite")},
+                   "parquet": {"root": os.path.join(tmp, "dataset")}}
+        for name in names:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                sinks.WRITERS[name](frames, **targets[name])
+            report(f"sink ({name})", time.perf_counter() - start, rows)
+
+def check_golden(scale, outputs, golden):
+    expected = golden.get(scale)
+    if expected is None:
+        print(f"   ⚠️ No golden digests for {scale}, run with --update-golden")
+        return True
+
+    ok = True
+    for name in sorted(set(expected) | set(outputs)):
+        if name not in outputs:
+            print(f"   ❌ {name}: missing output")
+            ok = False
+        elif digest(outputs[name]) != expected.get(name):
+            print(f"   ❌ {name}: output differs from golden")
+            ok = False
+    if ok:
+        print(f"   ✅ {len(outputs)} outputs match golden")
+    return ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on generated price lists.")
+    parser.add_argument("--scales", nargs="+", default=list(generator.SCALES), choices=list(generator.SCALES))
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"),
+                        help="Postgres to time the loader against (default: $BENCH_DATABASE_URL, skipped if unset)")
+    parser.add_argument("--load-modes", nargs="+", default=["copy"], choices=loader.LOAD_MODES)
+    parser.add_argument("--sinks", nargs="+", default=[], choices=["sqlite", "parquet"],
+                        help="Also time writing the outputs to local sinks (no server needed)")
+    parser.add_argument("--snapshots", nargs="*", metavar="SELECTOR",
+                        help="Also run stored snapshots (hash prefixes or fetched_at dates; all when none given)")
+    parser.add_argument("--update-golden", action="store_true", help="Record the current outputs as golden")
+    args = parser.parse_args(argv)
+
+    # (golden key, page loader) per case: generated scales, then any stored snapshots
+    cases = [(scale, lambda scale=scale: generator.generate_page(generator.SCALES[scale])) for scale in args.scales]
+    if args.snapshots is not None:
+        for entry in snapshots.find(args.snapshots):
+            cases.append((f"snapshot:{entry['hash'][:12]}", lambda digest=entry["hash"]: snapshots.load(digest)))
+
+    golden = load_golden()
+    ok = True
+    for scale, page in cases:
+        content = page()
+        print(f"\n📏 {scale}: {len(content) / 1e6:.1f} MB page")
+
+        outputs = run_stages(content)
+        if args.database_url:
+            run_loader(outputs, args.database_url, args.load_modes)
+        if args.sinks:
+            run_sinks(outputs, args.sinks)
+
+        if args.update_golden:
+            golden[scale] = {name: digest(df) for name, df in outputs.items()}
+        else:
+            ok = check_golden(scale, outputs, golden) and ok
+
+    if args.update_golden:
+        with open(GOLDEN_FILE, "w") as f:
+            json.dump(golden, f, indent=2, sort_keys=True)
+        print(f"\n💾 Golden digests written to {GOLDEN_FILE}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,16 @@
 import pandas as pd
+import contextlib
+import functools
+import io
 import os
+import sys
 import psycopg2
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import date, datetime
 from pathlib import Path
+from psycopg2.pool import ThreadedConnectionPool
 
 # STEP 0: Import pipeline stages
 from scripts import extractor
@@ -14,22 +22,42 @@ from scripts import iphone_new
 from scripts import iphone_used
 from scripts import macbook
 from scripts import samsung
+from scripts import loader
+from scripts import metrics
+from scripts import artifacts
+from scripts import checkpoint
+from scripts import snapshots
+from scripts import sinks
+from scripts import stages
+from scripts.artifacts import EXPECTED_COLUMNS
 
-# STEP 1: Setup PostgreSQL connection string
+# STEP 1: PostgreSQL connection string, only needed by runs that load into Postgres
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
-if not DATABASE_URL:
-    raise EnvironmentError("❌ DATABASE_URL must be set as an environment variable.")
-
 # STEP 2: Constants
-FOLDER_PATH = "processed"
-EXPECTED_COLUMNS = [
-    "box_status", "category", "make", "model", "storage", "color",
-    "grade", "lock_status", "active_status", "carrier", "price", "serial_number"
-]
+UPLOAD_MODE = os.environ.get("UPLOAD_MODE", "copy")  # "copy" or "values"
+# Load target: "append" to devices, "delta" into device_prices, "wide" into device_price_matrix,
+# "encoded" into device_facts
+LOAD_MODE = os.environ.get("LOAD_MODE", "append")
+WRITE_INTERMEDIATES = os.environ.get("WRITE_INTERMEDIATES") == "1"  # debug: dump every stage to disk
+PARALLEL = os.environ.get("PARALLEL") == "1"  # run device processors on a process pool
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS") or os.cpu_count() or 1)
+FORCE_RUN = os.environ.get("FORCE_RUN") == "1"  # ignore the extractor cache and always reprocess
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE") or 0)  # >0: commit and checkpoint every N rows
+STREAM = os.environ.get("STREAM") == "1"  # parse, process and load the price list one section at a time
+UPLOAD_CONCURRENCY = int(os.environ.get("UPLOAD_CONCURRENCY") or 1)  # >1: load files concurrently, one transaction each
+# Where processed frames go: any of postgres, sqlite, parquet, written concurrently
+SINKS = [sink.strip() for sink in os.environ.get("SINKS", "postgres").split(",") if sink.strip()]
+# Device processors, in the order they run
+PROCESSORS = [iphone_new, samsung, ipad, google_phones, macbook, iphone_used]
+
+def connect():
+    if not DATABASE_URL:
+        raise EnvironmentError("❌ DATABASE_URL must be set as an environment variable.")
+    return psycopg2.connect(DATABASE_URL)
 
 def clean_column_names(df):
-    df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
+    df.columns = [artifacts.column_key(col) for col in df.columns]
     return df
 
 def extract_date_from_url(url):
@@ -46,74 +74,703 @@ def extract_date_from_url(url):
         print(f"⚠️ Could not extract date from URL: {e}")
     return date.today()
 
-def upload_file(filepath, fetched_at):
-    print(f"\n📄 Uploading: {filepath}")
+def prepare_frame(df, fetched_at):
+    df = clean_column_names(df.copy())
+
+    for col in EXPECTED_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+
+    # MacBook frames in SERIAL_MODE=array carry their serials as one field
+    extra = ["serial_numbers"] if "serial_numbers" in df.columns else []
+    df = artifacts.apply_schema(df[EXPECTED_COLUMNS + extra])
+    df = df.mask(df.eq(""))  # Blank cells are stored as NULL
+    df["fetched_at"] = fetched_at  # ✅ Use extracted date
+    return df
+
+def upload_frame(df, name, fetched_at, cursor, mode=UPLOAD_MODE, load_mode=LOAD_MODE):
+    print(f"\n📄 Uploading: {name}")
+    with metrics.stage(f"upload:{Path(name).name}", rows_in=len(df)) as stats:
+        stats["rows_out"] = load_with_savepoint(df, name, fetched_at, cursor, mode, load_mode)
+    return stats["rows_out"]
+
+def load_with_savepoint(df, name, fetched_at, cursor, mode, load_mode):
+    # Returns the number of rows written (0 when the frame was empty, None when it failed)
+
+    if df.empty:
+        print("⚠️ Skipped: Empty file.")
+        return 0
+
+    # Each frame gets its own savepoint so one bad file doesn't sink the run's transaction
+    cursor.execute("SAVEPOINT upload_file")
     try:
-        df = pd.read_excel(filepath)
+        written = load_prepared(prepare_frame(df, fetched_at), name, cursor, mode, load_mode)
+        cursor.execute("RELEASE SAVEPOINT upload_file")
+        return written
+    except Exception as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT upload_file")
+        loader.forget_cached_state()
+        print(f"❌ Error uploading {name}: {e}")
+        return None
+
+def load_prepared(df, name, cursor, mode, load_mode):
+    # Load a prepared frame into the load mode's table and return the number of rows written
+    if "serial_numbers" in df.columns:
+        written, elapsed = loader.load_serial_prices(cursor, df)
+
+        rate = loader.rows_per_second(written, elapsed)
+        print(f"✅ Loaded {written} serial price rows from {Path(name).name} "
+              f"in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+        return written
+
+    if load_mode == "delta":
+        written, closed, delisted, elapsed = loader.upsert_delta(cursor, df, Path(name).name)
+
+        rate = loader.rows_per_second(len(df), elapsed)
+        print(f"✅ Delta-loaded {Path(name).name}: {written} new/changed of {len(df)} rows, "
+              f"{closed} intervals closed, {delisted} delisted in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+        return written
+
+    if load_mode == "wide":
+        written, elapsed = loader.load_wide(cursor, df)
+
+        rate = loader.rows_per_second(len(df), elapsed)
+        print(f"✅ Wide-loaded {Path(name).name}: {len(df)} rows as {written} price-matrix rows "
+              f"in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+        return written
+
+    if load_mode == "encoded":
+        elapsed = loader.load_encoded(cursor, df)
+    else:
+        elapsed = loader.load_frame(cursor, df, mode)
+
+    rate = loader.rows_per_second(len(df), elapsed)
+    print(f"✅ Uploaded {len(df)} rows from {Path(name).name} in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return len(df)
+
+def upload_concurrent(outputs, fetched_at, workers=UPLOAD_CONCURRENCY, mode=UPLOAD_MODE, load_mode=LOAD_MODE):
+    # Load every frame on its own pooled connection and transaction, at most `workers` at a time.
+    # A failed file is reported and rolled back on its own. Returns the names that were loaded
+    # (empty frames included), or None if the setup failed.
+    frames = {}
+    for name, df in outputs.items():
         if df.empty:
-            print("⚠️ Skipped: Empty file.")
-            return
+            print(f"⚠️ Skipped {name}: Empty file.")
+        else:
+            frames[name] = prepare_frame(df, fetched_at)
+    if not frames:
+        return list(outputs)
 
-        df = clean_column_names(df)
+    workers = max(1, min(workers, len(frames)))
+    db_pool = ThreadedConnectionPool(1, workers, DATABASE_URL)
+    try:
+        # Tables and dimension codes are created once, before any file loads
+        conn = db_pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                loader.prepare_concurrent_load(cursor, frames.values(), load_mode)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            loader.forget_cached_state()
+            print(f"❌ Could not prepare the {load_mode} tables: {e}")
+            return None
+        finally:
+            db_pool.putconn(conn)
 
-        for col in EXPECTED_COLUMNS:
-            if col not in df.columns:
-                df[col] = None
+        def upload(name, df):
+            conn = db_pool.getconn()
+            start = time.perf_counter()
+            try:
+                with metrics.stage(f"upload:{Path(name).name}", rows_in=len(df)) as stats:
+                    with conn.cursor() as cursor:
+                        stats["rows_out"] = load_prepared(df, name, cursor, mode, load_mode)
+                    conn.commit()
+                return name, stats["rows_out"], time.perf_counter() - start, None
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error uploading {name}: {e}")
+                return name, 0, time.perf_counter() - start, e
+            finally:
+                db_pool.putconn(conn, close=bool(conn.closed))
 
-        df = df[EXPECTED_COLUMNS]
-        df["fetched_at"] = fetched_at  # ✅ Use extracted date
+        print(f"⚙️ Uploading {len(frames)} files over {workers} connections...")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda item: upload(*item), frames.items()))
+        elapsed = time.perf_counter() - start
+    finally:
+        db_pool.closeall()
 
-        # Connect to Postgres and insert
-        conn = psycopg2.connect(DATABASE_URL)
-        cursor = conn.cursor()
+    failed = [name for name, _, _, error in results if error is not None]
+    print(f"\n📊 Uploaded {len(results) - len(failed)}/{len(results)} files, "
+          f"{sum(rows for _, rows, _, _ in results):,} rows in {elapsed:.2f}s")
+    for name, rows, seconds, error in results:
+        status = "❌" if error is not None else "✅"
+        detail = f"{type(error).__name__}: {error}" if error is not None else f"{rows:,} rows"
+        print(f"   {status} {Path(name).name:<22} {seconds:6.2f}s  {detail}")
+    return [name for name in outputs if name not in failed]
 
-        for row in df.to_dict(orient="records"):
-            columns = ', '.join(row.keys())
-            placeholders = ', '.join(['%s'] * len(row))
-            values = tuple(row.values())
+def chunk_frame(df, chunk_size, load_mode):
+    # Row slices of at most chunk_size rows. Wide loads pivot whole files and delta loads delist the
+    # keys a file no longer has, so neither is split.
+    if load_mode in ("wide", "delta") or chunk_size <= 0:
+        return [df] if len(df) else []
+    return [df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size)]
 
-            sql = f"INSERT INTO devices ({columns}) VALUES ({placeholders})"
-            cursor.execute(sql, values)
+def upload_chunked(manifest, outputs):
+    # Commit every chunk together with its checkpoint row. Stops at the first failure, leaving the
+    # manifest in place so `python run_pipeline.py resume` carries on after the last committed chunk.
+    run_id = manifest["run_id"]
+    settings = manifest["settings"]
+    fetched_at = date.fromisoformat(manifest["fetched_at"])
 
-        conn.commit()
-        cursor.close()
+    conn = connect()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(checkpoint.CHECKPOINT_DDL)
+            conn.commit()
+            done = checkpoint.committed_chunks(cursor, run_id)
+
+            for name in manifest["files"]:
+                chunks = chunk_frame(outputs[name], settings["chunk_size"], settings["load_mode"])
+                for i, chunk in enumerate(chunks):
+                    if (name, i) in done:
+                        continue
+
+                    print(f"\n📄 Uploading: {name} (chunk {i + 1}/{len(chunks)})")
+                    try:
+                        with metrics.stage(f"upload:{Path(name).name}:{i}", rows_in=len(chunk)) as stats:
+                            df = prepare_frame(chunk, fetched_at)
+                            stats["rows_out"] = load_prepared(df, name, cursor, settings["upload_mode"],
+                                                              settings["load_mode"])
+                            checkpoint.mark_chunk(cursor, run_id, name, i, len(chunk))
+                            conn.commit()
+                    except Exception as e:
+                        conn.rollback()
+                        loader.forget_cached_state()
+                        print(f"❌ Upload stopped at {name} chunk {i + 1}/{len(chunks)}: {e}")
+                        print("↩️ Run `python run_pipeline.py resume` to continue from the last committed chunk.")
+                        return False
+    finally:
         conn.close()
 
-        print(f"✅ Uploaded {len(df)} rows from {Path(filepath).name}")
+    return True
+
+def finish_chunked(manifest):
+    # Every chunk is committed: remember the uploads and pages, and drop the manifest
+    remember_uploads(manifest.get("upload_keys", {}), manifest.get("page_hash"))
+    extractor.save_cache(manifest["extractor_cache"])
+    checkpoint.clear_manifest()
+    print("🎉 All data uploaded successfully.")
+
+def resume():
+    # Continue the last chunked upload from its processed files, without scraping again
+    manifest = checkpoint.load_manifest()
+    if manifest is None:
+        print("✅ No interrupted upload to resume.")
+        return
+
+    print(f"↩️ Resuming upload run {manifest['run_id']} (fetched_at {manifest['fetched_at']})...")
+    try:
+        outputs = checkpoint.load_outputs(manifest)
+    except Exception as e:
+        print(f"❌ Could not load the run's processed files: {e}")
+        return
+
+    if upload_chunked(manifest, outputs):
+        finish_chunked(manifest)
+
+def stage_name(module):
+    return "process:" + module.__name__.rsplit(".", 1)[-1]
+
+def section_name(module):
+    return "section:" + module.SECTION
+
+def pipeline_stages():
+    # parse → cleaner → filer → one stage per device processor. Each processor only depends on its
+    # own section, so a change to one processor (or one section of the page) re-runs just that one.
+    # Stage functions live in the scripts modules so their code is part of the stage keys.
+    headers = [module.SECTION for module in PROCESSORS]
+    graph = [
+        stages.Stage("parse", extractor.parse_page, ["page"], ["rows"], code=[extractor],
+                     config={"parser": extractor.HTML_PARSER}),
+        stages.Stage("cleaner", cleaner.clean_rows, ["rows"], ["cleaned", "dropped"], code=[cleaner],
+                     counted=["cleaned"]),
+        stages.Stage("filer", functools.partial(filer.pick_sections, headers=headers), ["cleaned"],
+                     [section_name(module) for module in PROCESSORS], code=[filer], config={"sections": headers}),
+    ]
+    for module in PROCESSORS:
+        config = {"serial_mode": macbook.SERIAL_MODE} if module is macbook else None
+        graph.append(stages.Stage(stage_name(module), module.process, [section_name(module)],
+                                  [module.OUTPUT_FILE], code=[module], config=config))
+    return graph
+
+def processed(results):
+    # Processor outputs keyed by OUTPUT_FILE, in processor order
+    return {module.OUTPUT_FILE: results.get(module.OUTPUT_FILE) for module in PROCESSORS if module.OUTPUT_FILE in results}
+
+def run_stages(page, write_intermediates=WRITE_INTERMEDIATES, parallel=PARALLEL, force=FORCE_RUN,
+               root=stages.STAGE_CACHE):
+    # Run the stage graph on a page source (digest, loader). Stages whose code, config and inputs
+    # are unchanged reuse their cached results; with parallel, independent stages share a process pool.
+    if parallel:
+        print(f"⚙️ Running independent stages on up to {MAX_WORKERS} processes...")
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) if parallel else contextlib.nullcontext() as pool:
+        results = stages.run(pipeline_stages(), {"page": page}, pool=pool, force=force, root=root)
+
+    failures = [name for name in results.failed if name.startswith("process:")]
+    if failures:
+        print(f"⚠️ {len(failures)} processor(s) failed, continuing with the rest: {', '.join(failures)}")
+
+    if write_intermediates and "cleaned" in results:
+        print("\n💾 Writing intermediate files...")
+        with metrics.stage("write_intermediates"):
+            extractor.save_table(results.get("rows"))
+            cleaner.save(results.get("cleaned"), dropped=results.get("dropped"))
+            filer.save_sections(filer.split_sections(results.get("cleaned")))
+            for module in PROCESSORS:
+                if module.OUTPUT_FILE in results:
+                    module.save(results.get(module.OUTPUT_FILE))
+
+    return results
+
+def page_key(digest):
+    # Recorded once a page's uploads are done; later runs on the same unchanged page consult it
+    return stages.key("page", [], None, [digest])
+
+def upload_key(name, digest, fetched_at, sink="postgres"):
+    # An upload depends on the frame, fetched_at and the sink's target (plus the load modes for Postgres)
+    if sink == "postgres":
+        config = {"upload_mode": UPLOAD_MODE, "load_mode": LOAD_MODE, "fetched_at": fetched_at.isoformat(),
+                  "database": DATABASE_URL}
+        return stages.key("upload:" + Path(name).name, [loader, artifacts], config, [digest])
+
+    target = sinks.SQLITE_DATABASE if sink == "sqlite" else sinks.PARQUET_DATASET
+    config = {"fetched_at": fetched_at.isoformat(), "target": os.path.abspath(target)}
+    return stages.key(f"{sink}:{Path(name).name}", [sinks, artifacts], config, [digest])
+
+def remember_uploads(keys, page_digest, sink="postgres"):
+    # Record the committed uploads, and the page they came from, so later runs can skip them
+    label = "upload" if sink == "postgres" else sink
+    for name, key in keys.items():
+        stages.record(key, f"{label}:{Path(name).name}")
+    if page_digest is not None:
+        stages.record(page_key(page_digest), "page")
+
+def unchanged_page(digest):
+    # Source for a page that hasn't changed since its last run, or None if no run recorded it.
+    # Its bytes are only needed when the parse stage has to run again.
+    if digest is None or stages.lookup(page_key(digest)) is None:
+        return None
+
+    def load():
+        if snapshots.SNAPSHOT_DIR and os.path.exists(snapshots.object_path(digest)):
+            return snapshots.load(digest)
+        content = extractor.fetch_latest()[1]
+        if stages.source(content)[0] != digest:
+            raise ValueError("❌ The price list changed during the run, run the pipeline again")
+        return content
+    return digest, load
+
+def stream_sections(source, cursor, fetched_at):
+    # Table rows flow from the parser through the cleaner and section router as generators. Each
+    # section is built, processed and loaded as soon as the next header closes it, and dropped
+    # before the rest of the page is read. source is page bytes or a binary stream.
+    summary = {}
+    processors = {module.SECTION: module for module in PROCESSORS}
+    found = set()
+    with metrics.stage("stream:sections") as stats:
+        routed = filer.route_rows(cleaner.iter_clean(extractor.iter_table_rows(source), summary))
+        for header, rows in routed:
+            module = processors.get(header)
+            if module is None:
+                continue
+            found.add(header)
+            section = filer.section_frame(rows, summary["width"])
+            del rows
+
+            name = stage_name(module)
+            try:
+                with metrics.stage(name, rows_in=len(section)) as stage_stats:
+                    df = module.process(section)
+                    stage_stats["rows_out"] = len(df)
+            except Exception as e:
+                print(f"❌ {module.__name__} failed: {type(e).__name__}: {e}")
+                continue
+            finally:
+                del section
+
+            upload_frame(df, module.OUTPUT_FILE, fetched_at, cursor)
+            stats["rows_out"] = (stats["rows_out"] or 0) + len(df)
+            del df
+        stats["rows_in"] = summary["rows"]
+
+    for module in PROCESSORS:
+        if module.SECTION not in found:
+            print(f"❌ Section not found: {module.SECTION}")
+    print(cleaner.summarize(pd.DataFrame(summary["dropped"], columns=["phrase", "text"])))
+
+def run_streaming(cache):
+    # The page is parsed as it downloads and copied to its snapshot on the way. A page that only
+    # turns out unchanged once its hash is known (no ETag or Last-Modified) is rolled back.
+    try:
+        url, response = extractor.open_latest(cache)
+    except Exception as e:
+        print(f"❌ Pipeline step failed: {e}")
+        return
+    if response is None:
+        print("✅ Price list unchanged since the last run, nothing to do.")
+        return
+
+    fetched_at = extract_date_from_url(url)
+    print(f"📅 Extracted fetched_at date from URL: {fetched_at}")
+    print(f"\n📤 Streaming the price list into PostgreSQL ({LOAD_MODE} mode)...")
+    snapshot = snapshots.Writer()
+    reader = extractor.PageReader(response.iter_content(extractor.CHUNK_BYTES), snapshot)
+    committed = False
+    try:
+        with response:
+            conn = connect()
+            try:
+                with conn.cursor() as cursor:
+                    stream_sections(reader, cursor, fetched_at)
+                reader.drain()
+                if not extractor.remember(cache, url, response, reader.hexdigest()):
+                    conn.rollback()
+                    print("💤 Mailchimp price list unchanged since the last run.")
+                    print("✅ Price list unchanged since the last run, nothing to do.")
+                    snapshot.discard()
+                    return
+                conn.commit()
+                committed = True
+            except Exception as e:
+                conn.rollback()
+                loader.forget_cached_state()
+                print(f"❌ Upload failed, transaction rolled back: {e}")
+                reader.drain()
+            finally:
+                conn.close()
+        snapshot.commit(url, fetched_at)
     except Exception as e:
-        print(f"❌ Error uploading {filepath}: {e}")
+        print(f"❌ Pipeline step failed: {e}")
+        return
+    finally:
+        snapshot.discard()
+
+    if committed:
+        # Only remember these pages once their rows are safely committed
+        extractor.save_cache(cache)
+        print("🎉 All data uploaded successfully.")
+
+def backfill_date(source, today=None):
+    # fetched_at of an archived list from its URL or file name ("...-18-october-2024-price-list").
+    # Without a year it's the latest such date that isn't in the future; None when there's no date.
+    today = today or date.today()
+    slug = source.split("/")[-1]
+    if not source.startswith(("http://", "https://")) or slug.lower().endswith((".html", ".htm")):
+        slug = Path(slug).stem
+
+    parts = slug.split("-")
+    for i in range(len(parts) - 1):
+        if not (parts[i].isdigit() and parts[i+1].isalpha()):
+            continue
+        month_format = "%B" if len(parts[i+1]) > 3 else "%b"
+        try:
+            month = datetime.strptime(parts[i+1].capitalize(), month_format).month
+        except ValueError:
+            continue  # not a month name
+
+        day = int(parts[i])
+        if i + 2 < len(parts) and parts[i+2].isdigit() and len(parts[i+2]) == 4:
+            try:
+                return date(int(parts[i+2]), month, day)
+            except ValueError:
+                continue  # no such day that year, e.g. 30-february-2024
+        fetched_at = latest_date(month, day, today)
+        if fetched_at is not None:
+            return fetched_at
+    return None
+
+def latest_date(month, day, today):
+    # Latest month/day that isn't after today; 29 February goes back to the last leap year.
+    # Eight years back always reaches one. None when the month never has that day.
+    for year in range(today.year, today.year - 9, -1):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:
+            continue
+        if candidate <= today:
+            return candidate
+    return None
+
+def backfill_sources(args):
+    # Campaign URLs and HTML files as given; directories expand to the HTML files inside them
+    sources = []
+    for arg in args:
+        if os.path.isdir(arg):
+            sources += sorted(str(path) for path in Path(arg).iterdir() if path.suffix.lower() in (".html", ".htm"))
+        else:
+            sources.append(arg)
+    return sources
+
+def process_archived(source):
+    # Worker: fetch, read or unpack one archived list ("snapshot:<hash>" for the snapshot store)
+    # and run every stage on it.
+    # Returns (outputs, log, error); stage output is captured so lists don't interleave.
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        try:
+            if source.startswith("snapshot:"):
+                content = snapshots.load(source.split(":", 1)[1])
+            elif source.startswith(("http://", "https://")):
+                content = extractor.conditional_get(source)[0].content
+            else:
+                content = Path(source).read_bytes()
+            outputs = processed(run_stages(stages.source(content), write_intermediates=False, parallel=False))
+            return outputs, log.getvalue(), None
+        except Exception as e:
+            return {}, log.getvalue(), f"{type(e).__name__}: {e}"
+
+def backfill(args, workers=MAX_WORKERS):
+    # Rebuild price history from archived campaign pages, loaded in date order so delta intervals
+    # come out right
+    jobs = []
+    for source in backfill_sources(args):
+        fetched_at = backfill_date(source)
+        if fetched_at is None:
+            print(f"⚠️ Skipped {source}: no date in its name")
+            continue
+        jobs.append((fetched_at, source))
+    jobs.sort()
+    if not jobs:
+        print("❌ Nothing to backfill.")
+        return
+
+    print(f"🗂️ Backfilling {len(jobs)} price lists ({jobs[0][0]} to {jobs[-1][0]})...")
+    load_archived(jobs, workers)
+
+def replay(args, workers=MAX_WORKERS):
+    # Rerun the pipeline on stored snapshots (all, or those matching hash prefixes / dates) offline
+    entries = snapshots.find(args)
+    if not entries:
+        print(f"❌ No snapshots in {snapshots.SNAPSHOT_DIR or '(snapshots off)'} match {args or 'all'}.")
+        return
+
+    print(f"⏪ Replaying {len(entries)} snapshots ({entries[0]['fetched_at']} to {entries[-1]['fetched_at']})...")
+    load_archived([(date.fromisoformat(entry["fetched_at"]), f"snapshot:{entry['hash']}") for entry in entries],
+                  workers)
+
+def load_archived(jobs, workers=MAX_WORKERS):
+    # Process (fetched_at, source) jobs on a process pool and load them in the order given,
+    # one transaction per list
+    workers = max(1, min(workers, len(jobs)))
+    print(f"⚙️ Processing on {workers} processes...")
+
+    loaded = 0
+    conn = connect()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor, conn.cursor() as cursor:
+            # Keep a couple of lists per worker in flight; results are loaded in submission order
+            pending = deque()
+            queue = iter(jobs)
+            for fetched_at, source in queue:
+                pending.append((fetched_at, source, executor.submit(process_archived, source)))
+                if len(pending) >= 2 * workers:
+                    break
+
+            while pending:
+                fetched_at, source, future = pending.popleft()
+                for next_job in queue:
+                    pending.append((*next_job, executor.submit(process_archived, next_job[1])))
+                    break
+
+                outputs, log, error = future.result()
+                print(f"\n📅 {fetched_at}: {source}")
+                print(log, end="")
+                if error is not None:
+                    print(f"❌ Could not process {source}: {error}")
+                    continue
+
+                try:
+                    for name, df in outputs.items():
+                        upload_frame(df, name, fetched_at, cursor)
+                    conn.commit()
+                    loaded += 1
+                except Exception as e:
+                    conn.rollback()
+                    loader.forget_cached_state()
+                    print(f"❌ Upload of {source} failed, its transaction was rolled back: {e}")
+    finally:
+        conn.close()
+
+    print(f"\n🎉 Loaded {loaded}/{len(jobs)} price lists.")
 
 def main():
+    # The run report is written even when a stage fails part way through
+    try:
+        with metrics.stage("pipeline"):
+            if sys.argv[1:] == ["resume"]:
+                resume()
+            elif sys.argv[1:2] == ["backfill"]:
+                backfill(sys.argv[2:])
+            elif sys.argv[1:2] == ["replay"]:
+                replay(sys.argv[2:])
+            else:
+                run()
+            stages.prune()
+    finally:
+        metrics.write_reports()
+
+def run():
     print("🚀 Starting full Hanggroup pipeline...")
 
+    if not SINKS or any(sink not in sinks.SINKS for sink in SINKS):
+        print(f"❌ SINKS must list any of {', '.join(sinks.SINKS)}, got {','.join(SINKS) or 'nothing'}")
+        return
+    if STREAM and SINKS != ["postgres"]:
+        print("❌ STREAM=1 only loads into PostgreSQL, set SINKS=postgres")
+        return
+    if "postgres" in SINKS and not DATABASE_URL:
+        print("❌ DATABASE_URL must be set as an environment variable to load into PostgreSQL.")
+        return
+
+    # Start from an empty cache on forced runs so it still gets refreshed
+    cache = {} if FORCE_RUN else extractor.load_cache()
+
+    if STREAM:
+        run_streaming(cache)
+        return
+
     try:
-        url = extractor.main()
+        with metrics.stage("extractor"):
+            url, content = extractor.fetch_latest(cache)
         fetched_at = extract_date_from_url(url)
+        if content is not None:
+            # Snapshot before parsing, so a page that breaks the parser is still kept
+            snapshots.save(content, url, fetched_at)
+            page = stages.source(content)
+        else:
+            # Stages whose code or config changed since the page was loaded still run again
+            page = unchanged_page(cache.get(url, {}).get("hash"))
+            if page is None:
+                print("✅ Price list unchanged since the last run, nothing to do.")
+                return
+
         print(f"📅 Extracted fetched_at date from URL: {fetched_at}")
+        results = run_stages(page)
 
-        cleaner.main()
-        filer.main()
-        iphone_new.main()
-        samsung.main()
-        ipad.main()
-        google_phones.main()
-        macbook.main()
-        iphone_used.main()
+        # A processed file whose upload to a sink already committed with the same contents and
+        # settings is skipped for that sink
+        names = [module.OUTPUT_FILE for module in PROCESSORS if module.OUTPUT_FILE in results]
+        pending = {}
+        for sink in SINKS:
+            keys = {name: upload_key(name, results.digests[name], fetched_at, sink) for name in names}
+            pending[sink] = {name: key for name, key in keys.items() if FORCE_RUN or stages.lookup(key) is None}
+        outputs = {name: results.get(name) for name in names if any(name in keys for keys in pending.values())}
     except Exception as e:
         print(f"❌ Pipeline step failed: {e}")
         return
 
-    print("\n📤 Uploading cleaned files to PostgreSQL...")
+    if not names:
+        print("❌ No device processor produced output.")
+        return
 
-    if not os.path.exists(FOLDER_PATH):
-        print(f"❌ Folder not found: {FOLDER_PATH}")
+    for sink, keys in pending.items():
+        if len(keys) < len(names):
+            print(f"♻️ {len(names) - len(keys)} processed file(s) unchanged since their last {sink} upload")
+    if not outputs:
+        remember_uploads({}, page[0])
+        extractor.save_cache(cache)
+        print("✅ Nothing changed since the last upload, nothing to do.")
         return
 
-    for file in os.listdir(FOLDER_PATH):
-        if file.endswith(".xlsx"):
-            upload_file(os.path.join(FOLDER_PATH, file), fetched_at)
+    # Every sink writes the same prepared frames on its own thread
+    prepared = {name: prepare_frame(df, fetched_at) for name, df in outputs.items()}
+    targets = {sink: keys for sink, keys in pending.items() if keys}
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = {
+            sink: executor.submit(write_sink, sink, {name: prepared[name] for name in keys},
+                                  {"fetched_at": fetched_at, "upload_keys": keys, "page_hash": page[0],
+                                   "extractor_cache": cache})
+            for sink, keys in targets.items()
+        }
+        written = {sink: future.result() for sink, future in futures.items()}
+
+    for sink, done in written.items():
+        if done is not None:
+            remember_uploads({name: pending[sink][name] for name in done}, None, sink)
+    if any(done is None for done in written.values()):
+        return
+
+    # Only remember these pages once every sink has committed their rows
+    remember_uploads({}, page[0])
+    extractor.save_cache(cache)
 
     print("🎉 All data uploaded successfully.")
 
+def write_sink(sink, frames, run):
+    # Write prepared frames to a sink; returns the names written (empty frames count as written),
+    # or None when the sink failed
+    print(f"\n📤 Writing processed frames to {sink}...")
+    try:
+        written = sinks.WRITERS[sink]({name: df for name, df in frames.items() if not df.empty}, run)
+    except Exception as e:
+        print(f"❌ Writing to {sink} failed: {e}")
+        return None
+    if written is None:
+        return None
+    return written + [name for name, df in frames.items() if df.empty]
+
+def upload_postgres(outputs, run):
+    # The PostgreSQL writer: loads the way UPLOAD_CHUNK_SIZE and UPLOAD_CONCURRENCY ask. Returns the
+    # names committed, or None when the upload failed (chunked uploads can then be resumed).
+    print(f"🐘 PostgreSQL load mode: {LOAD_MODE}")
+    fetched_at, keys, page_digest, cache = (
+        run["fetched_at"], run["upload_keys"], run["page_hash"], run["extractor_cache"])
+
+    if UPLOAD_CHUNK_SIZE > 0:
+        settings = {"chunk_size": UPLOAD_CHUNK_SIZE, "upload_mode": UPLOAD_MODE, "load_mode": LOAD_MODE}
+        manifest = checkpoint.load_manifest()
+        if manifest is None:
+            manifest = checkpoint.new_run(outputs, fetched_at, settings, cache)
+            manifest.update(upload_keys=keys, page_hash=page_digest)
+        elif checkpoint.same_run(manifest, fetched_at, settings, keys):
+            # The same frames as an interrupted run: carry on after its committed chunks
+            print(f"↩️ Continuing unfinished upload run {manifest['run_id']}...")
+            manifest["extractor_cache"] = cache
+        else:
+            # Starting over would load that run's committed chunks a second time
+            print(f"❌ Upload run {manifest['run_id']} (fetched_at {manifest['fetched_at']}) never finished. "
+                  f"Run `python run_pipeline.py resume` to finish it, or delete {checkpoint.MANIFEST_FILE} "
+                  "to drop it, before uploading anything else.")
+            return None
+        checkpoint.save_manifest(manifest)
+        if not upload_chunked(manifest, outputs):
+            return None
+        checkpoint.clear_manifest()
+        return list(outputs)
+
+    if UPLOAD_CONCURRENCY > 1:
+        return upload_concurrent(outputs, fetched_at)
+
+    # One connection and one transaction for the whole upload
+    conn = connect()
+    try:
+        with conn.cursor() as cursor:
+            written = {name: upload_frame(df, name, fetched_at, cursor) for name, df in outputs.items()}
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        loader.forget_cached_state()
+        print(f"❌ Upload failed, transaction rolled back: {e}")
+        return None
+    finally:
+        conn.close()
+    return [name for name in outputs if written[name] is not None]
+
+# Its chunking, checkpoints and connections live here, so the PostgreSQL writer is registered here
+sinks.WRITERS["postgres"] = upload_postgres
+
 if __name__ == "__main__":
     main()
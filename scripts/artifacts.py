@@ -0,0 +1,95 @@
+import os
+import numpy as np
+import pandas as pd
+
+from scripts import metrics
+
+# Intermediate files are written in this format; xlsx is kept as an opt-in export
+ARTIFACT_FORMAT = os.environ.get("ARTIFACT_FORMAT", "parquet")
+EXTENSIONS = {
+    "parquet": ".parquet",
+    "feather": ".feather",
+    "xlsx": ".xlsx",
+}
+
+# Schema of the processed device frames, as loaded into the devices table
+EXPECTED_COLUMNS = [
+    "box_status", "category", "make", "model", "storage", "color",
+    "grade", "lock_status", "active_status", "carrier", "price", "serial_number"
+]
+COLUMN_TYPES = {col: "string" for col in EXPECTED_COLUMNS}
+COLUMN_TYPES["price"] = "float64"
+
+def column_key(col):
+    # "Box Status" -> "box_status"
+    return str(col).strip().lower().replace(" ", "_")
+
+def apply_schema(df):
+    # Cast every schema column (in whatever casing the processor used) to its declared type
+    df = df.copy()
+    for col in df.columns:
+        dtype = COLUMN_TYPES.get(column_key(col))
+        if dtype is not None:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def artifact_path(stem, fmt=None):
+    fmt = fmt or ARTIFACT_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"❌ Unknown artifact format: {fmt} (expected one of {list(EXTENSIONS)})")
+    return stem + EXTENSIONS[fmt]
+
+def find_artifact(stem):
+    # Prefer the configured format, then fall back to any other one on disk
+    formats = [ARTIFACT_FORMAT] + [fmt for fmt in EXTENSIONS if fmt != ARTIFACT_FORMAT]
+    for fmt in formats:
+        path = artifact_path(stem, fmt)
+        if os.path.exists(path):
+            return path, fmt
+    return None, None
+
+def save_frame(df, stem, header=True, fmt=None):
+    # header=False marks a raw positional sheet (extractor/cleaner/filer output)
+    fmt = fmt or ARTIFACT_FORMAT
+    path = artifact_path(stem, fmt)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if fmt == "xlsx":
+        df.to_excel(path, index=False, header=header)
+        metrics.count_bytes(written=os.path.getsize(path))
+        return path
+
+    if header:
+        df = apply_schema(df)
+    else:
+        # Columnar formats need string column names and a single type per column
+        df = df.astype(object).where(df.isna(), df.astype(str))
+        df.columns = [str(col) for col in df.columns]
+
+    df = df.reset_index(drop=True)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_feather(path)
+    metrics.count_bytes(written=os.path.getsize(path))
+    return path
+
+def load_frame(stem, header=True):
+    path, fmt = find_artifact(stem)
+    if path is None:
+        raise FileNotFoundError(f"No artifact found for {stem}")
+    metrics.count_bytes(read=os.path.getsize(path))
+
+    if fmt == "xlsx":
+        df = pd.read_excel(path, header=0 if header else None)
+        return apply_schema(df) if header else df
+
+    df = pd.read_parquet(path) if fmt == "parquet" else pd.read_feather(path)
+    if header:
+        return df
+
+    # Raw sheets come back positional with NaN blanks, like a header-less read_excel
+    df.columns = [int(col) for col in df.columns]
+    return df.astype(object).where(df.notna(), np.nan)
@@ -0,0 +1,77 @@
+import json
+import os
+import uuid
+from datetime import datetime
+
+from scripts import artifacts
+
+# Chunked uploads keep their run manifest (processed files, fetched_at, settings) on disk, and
+# record every committed chunk in upload_checkpoints inside the same transaction as its rows,
+# so a chunk is either loaded and checkpointed or neither
+MANIFEST_FILE = os.environ.get("UPLOAD_MANIFEST", ".cache/upload_run.json")
+
+CHECKPOINT_DDL = """
+CREATE TABLE IF NOT EXISTS upload_checkpoints (
+    run_id text NOT NULL,
+    file text NOT NULL,
+    chunk integer NOT NULL,
+    rows integer NOT NULL,
+    committed_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (run_id, file, chunk)
+)
+"""
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    # Written to a temp file first so a crash never leaves half a manifest
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+def clear_manifest(path=MANIFEST_FILE):
+    if os.path.exists(path):
+        os.remove(path)
+
+def new_run(outputs, fetched_at, settings, extractor_cache):
+    # Save the processed frames and start a manifest for them; returns the manifest
+    for name, df in outputs.items():
+        artifacts.save_frame(df, name)
+
+    manifest = {
+        "run_id": datetime.now().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8],
+        "fetched_at": fetched_at.isoformat(),
+        "files": list(outputs),
+        "settings": settings,
+        "extractor_cache": extractor_cache,
+    }
+    save_manifest(manifest)
+    return manifest
+
+def same_run(manifest, fetched_at, settings, upload_keys):
+    # True when a manifest describes this very upload: the same frames (their upload keys cover the
+    # contents, modes and database), fetched_at and chunking, so its committed chunks can be skipped
+    return (manifest["fetched_at"] == fetched_at.isoformat()
+            and manifest["settings"] == settings
+            and manifest.get("upload_keys") == upload_keys)
+
+def load_outputs(manifest):
+    return {name: artifacts.load_frame(name) for name in manifest["files"]}
+
+def committed_chunks(cursor, run_id):
+    cursor.execute("SELECT file, chunk FROM upload_checkpoints WHERE run_id = %s", (run_id,))
+    return set(cursor.fetchall())
+
+def mark_chunk(cursor, run_id, name, chunk, rows):
+    cursor.execute(
+        "INSERT INTO upload_checkpoints (run_id, file, chunk, rows) VALUES (%s, %s, %s, %s)",
+        (run_id, name, chunk, rows),
+    )
@@ -1,40 +1,101 @@
 import pandas as pd
-import os
+import re
 
-def main():
-    # Check if input file exists
-    input_file = "hanggroup_prices.xlsx"
-    if not os.path.exists(input_file):
-        print(f"❌ Input file not found: {input_file}")
-        return
+from scripts import artifacts
+from scripts import extractor
 
-    # Load the Excel file
-    df = pd.read_excel(input_file, header=None)
+# Refined unwanted phrases — removed Xfinity, Verizon unlocked
+unwanted_phrases = [
+    "Hanggroup", "Kwun Tong", "Group of", "WhatsApp", "Telegram", "Minor Price Update",
+    "Dish Boost", "Fedex", "bulk", "Bank Wire", "PayPal", "China Bank", "USDT",
+    "NY", "Florida", "Chicago", "Texas", "Price Update",
+    "Room", "Hong Kong", "We DONT", "payment", "model iPads"
+    # DO NOT include Verizon/Xfinity/Sprint etc.
+]
 
-    # Refined unwanted phrases — removed Xfinity, Verizon unlocked
-    unwanted_phrases = [
-        "Hanggroup", "Kwun Tong", "Group of", "WhatsApp", "Telegram", "Minor Price Update",
-        "Dish Boost", "Fedex", "bulk", "Bank Wire", "PayPal", "China Bank", "USDT",
-        "NY", "Florida", "Chicago", "Texas", "Price Update",
-        "Room", "Hong Kong", "We DONT", "payment", "model iPads"
-        # DO NOT include Verizon/Xfinity/Sprint etc.
-    ]
+# All phrases compiled once into a single case-insensitive alternation
+UNWANTED_PATTERN = re.compile(
+    "(" + "|".join(re.escape(phrase) for phrase in unwanted_phrases) + ")", re.IGNORECASE
+)
+PHRASE_LOOKUP = {phrase.lower(): phrase for phrase in unwanted_phrases}
 
-    # Filter function
-    def keep_row(row):
-        row_text = " ".join(str(cell) for cell in row if pd.notna(cell)).lower()
-        return not any(word.lower() in row_text for word in unwanted_phrases)
+OUTPUT_FILE = "hanggroup_prices_cleaned"
+DROPPED_FILE = "hanggroup_prices_dropped"
 
-    # Apply filter
-    cleaned_df = df[df.apply(keep_row, axis=1)]
+def row_text(df):
+    # Space-join the non-empty cells of every row, one column at a time
+    text = pd.Series("", index=df.index, dtype=object)
+    for col in df.columns:
+        cells = df[col]
+        text = text.where(cells.isna(), text + " " + cells.astype(str))
+    return text.str.lstrip(" ")
+
+def filter_rows(df):
+    # Returns the kept rows and, for every dropped row, the phrase that matched it
+    text = row_text(df)
+    matched = text.str.extract(UNWANTED_PATTERN, expand=False)
+    unwanted = matched.notna()
+
+    dropped = pd.DataFrame({
+        "phrase": matched[unwanted].str.lower().map(PHRASE_LOOKUP),
+        "text": text[unwanted],
+    })
 
     # Drop fully empty rows
-    cleaned_df = cleaned_df.dropna(how="all")
+    cleaned_df = df[~unwanted].dropna(how="all")
+    return cleaned_df, dropped
+
+def iter_clean(rows, summary):
+    # Streaming filter_rows over row tuples: yields (position, row) for kept rows. summary gets
+    # the rows read ("rows"), the widest row ("width") and the (phrase, text) of every dropped row
+    summary.update(rows=0, width=0, dropped=[])
+    dropped = summary["dropped"]
+    for position, row in enumerate(rows):
+        summary["rows"] += 1
+        summary["width"] = max(summary["width"], len(row))
+        text = " ".join(cell for cell in row if cell).lstrip(" ")
+        match = UNWANTED_PATTERN.search(text)
+        if match:
+            dropped.append((PHRASE_LOOKUP[match.group(1).lower()], text))
+        elif any(row):  # dropna(how="all"): a row of spaces is still kept
+            yield position, row
+
+def summarize(dropped):
+    if dropped.empty:
+        return "🧹 No rows dropped by unwanted phrases"
+    counts = dropped["phrase"].value_counts()
+    details = ", ".join(f"{phrase} ×{count}" for phrase, count in counts.items())
+    return f"🧹 Dropped {len(dropped)} rows: {details}"
+
+def clean_rows(rows):
+    # Extracted rows -> (cleaned sheet, dropped rows), with the summary printed (the cleaner stage)
+    cleaned, dropped = filter_rows(extractor.to_frame(rows))
+    print(summarize(dropped))
+    return cleaned, dropped
+
+def save(cleaned_df, filename=OUTPUT_FILE, dropped=None):
+    path = artifacts.save_frame(cleaned_df, filename, header=False)
+    print(f"✅ Cleaned file saved as '{path}'")
+
+    # Audit trail of which phrase removed which row
+    if dropped is not None:
+        path = artifacts.save_frame(dropped.reset_index(names="row"), DROPPED_FILE)
+        print(f"🧾 Dropped rows saved as '{path}'")
+
+def main():
+    # Check if input file exists
+    input_file = "hanggroup_prices"
+    if artifacts.find_artifact(input_file)[0] is None:
+        print(f"❌ Input file not found: {input_file}")
+        return
 
-    # Save cleaned output
-    cleaned_df.to_excel("hanggroup_prices_cleaned.xlsx", index=False, header=False)
+    # Load the raw sheet
+    df = artifacts.load_frame(input_file, header=False)
 
-    print("✅ Cleaned file saved as 'hanggroup_prices_cleaned.xlsx'")
+    # Clean and save output
+    cleaned_df, dropped = filter_rows(df)
+    print(summarize(dropped))
+    save(cleaned_df, dropped=dropped)
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,97 @@
+import codecs
+import hashlib
+import json
+import os
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+import numpy as np
 import pandas as pd
 
-def get_latest_mailchimp_url():
-    print("🚀 Fetching Hanggroup price page...")
-    main_url = 'https://www.hanggroup.com/price/'
-    response = requests.get(main_url)
+from scripts import artifacts
+from scripts import metrics
+
+RAW_FILE = "hanggroup_prices"
+MAIN_URL = 'https://www.hanggroup.com/price/'
+
+# lxml parses the price list in C; fall back to BeautifulSoup when it isn't installed
+try:
+    from lxml import etree
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Fallback path: only <table> subtrees get built, the rest of the page is skipped
+TABLES_ONLY = SoupStrainer("table")
+
+# ETag / Last-Modified / content hash of the pages seen on the last successful run
+CACHE_FILE = os.environ.get("EXTRACTOR_CACHE", ".cache/extractor.json")
+
+# Streamed pages are read this many bytes at a time; the encoding is judged on the first read
+CHUNK_BYTES = 1 << 16
+
+def load_cache(path=CACHE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_cache(cache, path=CACHE_FILE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(cache, f, indent=2)
+
+def conditional_get(url, cache=None, stream=False):
+    # Returns (response, changed); response is None when the server answered 304. With stream the
+    # body is left unread, and the caller checks its hash with remember() once it has read it.
+    if cache is None:
+        response = requests.get(url, stream=stream)
+        response.raise_for_status()
+        if not stream:
+            metrics.count_bytes(read=len(response.content))
+        return response, True
+
+    entry = cache.get(url, {})
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = requests.get(url, headers=headers, stream=stream)
+    if response.status_code == 304:
+        return None, False
     response.raise_for_status()
+    if stream:
+        return response, True
+    metrics.count_bytes(read=len(response.content))
+
+    # Servers without validators still get short-circuited by the content hash
+    return response, remember(cache, url, response, hashlib.sha256(response.content).hexdigest())
+
+def remember(cache, url, response, digest):
+    # Record a fetched page's validators and content hash; True when the hash changed
+    entry = cache.get(url, {})
+    cache[url] = {
+        **entry,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "hash": digest,
+    }
+    return digest != entry.get("hash")
+
+def get_latest_mailchimp_url(cache=None):
+    print("🚀 Fetching Hanggroup price page...")
+    response, changed = conditional_get(MAIN_URL, cache)
+    if not changed and cache[MAIN_URL].get("iframe_url"):
+        iframe_url = cache[MAIN_URL]["iframe_url"]
+        print(f"📝 Price page unchanged, reusing Mailchimp URL: {iframe_url}")
+        return iframe_url
+
+    if response is None:
+        # 304 without a remembered iframe URL: fall back to a full fetch
+        response, changed = conditional_get(MAIN_URL)
 
     soup = BeautifulSoup(response.content, 'html.parser')
 
@@ -16,43 +101,286 @@ def get_latest_mailchimp_url():
     
     iframe_url = iframe['src']
     print(f"📝 Found Mailchimp URL: {iframe_url}")
+    if cache is not None:
+        cache.setdefault(MAIN_URL, {})["iframe_url"] = iframe_url
     return iframe_url
 
-def fetch_mailchimp_table(url):
+def fetch_mailchimp_page(url, cache=None):
+    # Raw page bytes; None when the page is unchanged since the cached run
     print("🌐 Fetching Mailchimp price list page...")
-    res = requests.get(url)
-    res.raise_for_status()
-    soup = BeautifulSoup(res.content, "html.parser")
+    res, changed = conditional_get(url, cache)
+    if not changed:
+        print("💤 Mailchimp price list unchanged since the last run.")
+        return None
+    return res.content
+
+def open_mailchimp_page(url, cache=None):
+    # Streaming fetch_mailchimp_page: the response with its body still unread, or None when the
+    # server answered 304. A page only caught by its content hash has to be read first.
+    print("🌐 Streaming Mailchimp price list page...")
+    response, changed = conditional_get(url, cache, stream=True)
+    if not changed:
+        print("💤 Mailchimp price list unchanged since the last run.")
+        return None
+    return response
+
+class PageReader:
+    # Binary file-like over the chunks of a streamed page. Every chunk is hashed, counted and
+    # copied to `sink` (a snapshot being written) as the parser reads it, so the page is never held
+    # whole. drain() reads what the parser left, so hexdigest() covers every byte.
+    def __init__(self, chunks, sink=None):
+        self.chunks = iter(chunks)
+        self.sink = sink
+        self.sha256 = hashlib.sha256()
+        self.buffer = b""
+
+    def next_chunk(self):
+        chunk = next(self.chunks, b"")
+        self.sha256.update(chunk)
+        metrics.count_bytes(read=len(chunk))
+        if self.sink is not None:
+            self.sink.write(chunk)
+        return chunk
 
-    # Look for the first <table> that has "iPhone" in any row
-    tables = soup.find_all("table")
-    for table in tables:
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self.buffer) < size:
+            chunk = self.next_chunk()
+            if not chunk:
+                break
+            self.buffer += chunk
+        if size is None or size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def drain(self):
+        while self.next_chunk():
+            pass
+        self.buffer = b""
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+def find_pricing_rows(soup):
+    # Rows of the first <table> that has "iPhone" in any row
+    for table in soup.find_all("table"):
+        # Cheap whole-table check first; only candidate tables get their rows scanned
+        if "iPhone" not in table.get_text():
+            continue
         rows = table.find_all("tr")
+        if any("iPhone" in tr.get_text() for tr in rows):
+            return rows
+    return None
+
+def parse_table_soup(content):
+    soup = BeautifulSoup(content, "html.parser", parse_only=TABLES_ONLY)
+
+    rows = find_pricing_rows(soup)
+    if rows is None:
+        raise ValueError("❌ Could not find a pricing table containing 'iPhone'.")
+
+    data = []
+    for tr in rows:
+        cols = tuple(td.get_text(strip=True).replace("\u3000", "") for td in tr.find_all(["td", "th"]))
+        if any(cols):
+            data.append(cols)
+    return data
+
+def parse_table_lxml(content):
+    # Decode the way BeautifulSoup would, then let lxml build the tree in C
+    markup = UnicodeDammit(content, is_html=True).unicode_markup
+    root = etree.fromstring(markup.encode("utf-8"), etree.HTMLParser(encoding="utf-8"))
+    if root is None:
+        raise ValueError("❌ Could not find a pricing table containing 'iPhone'.")
+
+    # get_text() never returns script/style text, so drop it up front
+    etree.strip_elements(root, "script", "style", with_tail=False)
+
+    for table in root.iter("table"):
+        if "iPhone" not in "".join(table.itertext()):
+            continue
+        rows = list(table.iter("tr"))
+        if not any("iPhone" in "".join(tr.itertext()) for tr in rows):
+            continue
+
+        # Found the right table. Cell text matches get_text(strip=True).
+        data = []
         for tr in rows:
-            if "iPhone" in tr.get_text():
-                # Found the right table. Parse all rows.
-                data = []
-                for tr in rows:
-                    cols = [td.get_text(strip=True).replace("\u3000", "") for td in tr.find_all(["td", "th"])]
+            cols = tuple(
+                "".join(text.strip() for text in td.itertext()).replace("\u3000", "")
+                for td in tr.iter("td", "th")
+            )
+            if any(cols):
+                data.append(cols)
+        return data
+
+    raise ValueError("❌ Could not find a pricing table containing 'iPhone'.")
+
+def utf8_chunks(stream, size=CHUNK_BYTES):
+    # A binary page stream re-encoded as UTF-8 while it's read. The encoding is the one
+    # UnicodeDammit picks for the first chunk (BOM and <meta charset> included), cut after its last
+    # tag so a character split by the read can't throw it off. A page shorter than a chunk is
+    # sniffed whole, exactly as its bytes would be.
+    head = b""
+    while len(head) < size:
+        chunk = stream.read(size - len(head))
+        if not chunk:
+            break
+        head += chunk
+    sample = head if len(head) < size else head[:head.rfind(b">") + 1] or head
+    encoding, bom = "utf-8", 0
+    if sample:
+        dammit = UnicodeDammit(sample, is_html=True)
+        bom = len(sample) - len(dammit.detector.markup)
+        # "ascii" only means no other bytes were seen yet
+        if dammit.original_encoding not in (None, "ascii"):
+            encoding = dammit.original_encoding
+
+    decoder = codecs.getincrementaldecoder(encoding)("replace")
+    chunk = head[bom:]
+    while chunk:
+        yield decoder.decode(chunk).encode("utf-8")
+        chunk = stream.read(size)
+    yield decoder.decode(b"", final=True).encode("utf-8")
+
+def html_events(chunks):
+    # (event, element) pairs of an HTML document fed to lxml one UTF-8 chunk at a time
+    parser = etree.HTMLPullParser(events=("start", "end"), encoding="utf-8")
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+def iter_table_rows(content):
+    # Streaming parse_table over page bytes or a binary stream (a PageReader): same rows, but the
+    # tree is built incrementally and every finished row and table is freed, so memory doesn't
+    # grow with the page. A stream is only read as far as the end of the pricing table.
+    # The pricing table is the first top-level <table> with "iPhone" in one of its rows; its rows
+    # are held back until that row shows up, then streamed. Nested <tr>s come out in document
+    # order, after the row that contains them is complete.
+    if HTML_PARSER != "lxml":
+        yield from parse_table_soup(content if isinstance(content, bytes) else content.read())
+        return
+
+    if isinstance(content, bytes):
+        # Decoded the way BeautifulSoup would
+        events = html_events([UnicodeDammit(content, is_html=True).unicode_markup.encode("utf-8")])
+    else:
+        events = html_events(utf8_chunks(content))
+
+    tables = 0       # open <table> depth
+    open_rows = []   # document-order numbers of the open <tr>s
+    next_row = 0
+    finished = {}    # finished rows waiting for an enclosing <tr> to finish
+    held = []        # rows of the current top-level table before its first "iPhone" row
+    found = False
+
+    def free(elem):
+        # Drop the element's subtree and every sibling already handled before it
+        elem.clear(keep_tail=True)
+        parent = elem.getparent()
+        while parent is not None and elem.getprevious() is not None:
+            del parent[0]
+
+    # An empty document has no root element, which parse_table_lxml also rejects
+    try:
+        for event, elem in events:
+            tag = elem.tag
+            if event == "start":
+                if tag == "table":
+                    tables += 1
+                elif tag == "tr" and tables:
+                    open_rows.append(next_row)
+                    next_row += 1
+                continue
+
+            if tag == "tr" and tables:
+                # get_text() never returns script/style text
+                etree.strip_elements(elem, "script", "style", with_tail=False)
+                cols = tuple(
+                    "".join(text.strip() for text in td.itertext()).replace("\u3000", "")
+                    for td in elem.iter("td", "th")
+                )
+                finished[open_rows.pop()] = (cols, "iPhone" in "".join(elem.itertext()))
+                if open_rows:
+                    continue
+
+                for number in sorted(finished):
+                    cols, has_iphone = finished[number]
+                    if not found and has_iphone:
+                        found = True
+                        yield from held
+                        held = []
                     if any(cols):
-                        data.append(cols)
-                return data
+                        if found:
+                            yield cols
+                        else:
+                            held.append(cols)
+                finished.clear()
+                free(elem)
+            elif tag == "table":
+                tables -= 1
+                if tables == 0:
+                    if found:
+                        return
+                    held = []
+                    free(elem)
+    except etree.XMLSyntaxError:
+        pass
 
     raise ValueError("❌ Could not find a pricing table containing 'iPhone'.")
 
-def save_to_excel(data, filename="hanggroup_prices.xlsx"):
+def parse_table(content):
+    # Rows of the pricing table as tuples of cell text
+    if HTML_PARSER == "lxml":
+        return parse_table_lxml(content)
+    return parse_table_soup(content)
+
+def parse_page(content):
+    # parse_table with a sample of the rows printed (the parse stage)
+    rows = parse_table(content)
+    show_sample(rows)
+    return rows
+
+def to_frame(data):
+    # Build the raw sheet in memory; blank cells become NaN like they do after an xlsx round trip
     df = pd.DataFrame(data)
-    df.to_excel(filename, index=False, header=False)
-    print(f"✅ Saved {len(data)} rows to {filename}")
+    return df.mask(df.eq(""), np.nan)
+
+def save_table(data, filename=RAW_FILE):
+    path = artifacts.save_frame(to_frame(data), filename, header=False)
+    print(f"✅ Saved {len(data)} rows to {path}")
+
+def open_latest(cache=None):
+    # Streaming fetch_latest: (url, response with its body unread, or None when unchanged)
+    url = get_latest_mailchimp_url(cache)
+    return url, open_mailchimp_page(url, cache)
+
+def fetch_latest(cache=None):
+    # (url, page bytes) of the latest price list; the bytes are None when unchanged since the cached run
+    url = get_latest_mailchimp_url(cache)
+    return url, fetch_mailchimp_page(url, cache)
+
+def show_sample(rows):
+    print(f"✅ Found {len(rows)} rows. Sample:")
+    for row in rows[:3]:
+        print(row)
+
+def extract(cache=None):
+    # Fetch the latest price list and return (url, rows) without touching disk.
+    # With a cache, rows is None when neither page changed since it was saved.
+    url, content = fetch_latest(cache)
+    if content is None:
+        return url, None
+    rows = parse_table(content)
+    show_sample(rows)
+    return url, rows
 
 def main():
     try:
-        url = get_latest_mailchimp_url()
-        rows = fetch_mailchimp_table(url)
-        print(f"✅ Found {len(rows)} rows. Sample:")
-        for row in rows[:3]:
-            print(row)
-        save_to_excel(rows)
+        url, rows = extract()
+        save_table(rows)
         return url  # <-- FIXED INDENTATION
     except Exception as e:
         print(f"❌ Error: {e}")
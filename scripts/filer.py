@@ -1,51 +1,143 @@
+import numpy as np
 import pandas as pd
 import os
 
-def main():
-    # Load the cleaned Excel file
-    input_file = "hanggroup_prices_cleaned.xlsx"
-    if not os.path.exists(input_file):
-        print(f"❌ Input file not found: {input_file}")
-        return
+from scripts import artifacts
 
-    df = pd.read_excel(input_file, header=None)
-
-    # Define the headings we want to split on
-    section_headers = [
-        "iPhone New (US Spec)",
-        "Others",
-        "iPad",
-        "MacBook",
-        "Samsung Phones",
-        "Google Phones",
-        """iCloud Activation Lock / MDM Configuration Lock / Zip Code SSN Lock 
+# Define the headings we want to split on
+section_headers = [
+    "iPhone New (US Spec)",
+    "Others",
+    "iPad",
+    "MacBook",
+    "Samsung Phones",
+    "Google Phones",
+    """iCloud Activation Lock / MDM Configuration Lock / Zip Code SSN Lock 
                         iPhone""",
-        "iPhone Used (US Spec)"
-    ]
+    "iPhone Used (US Spec)"
+]
+
+# Normalize headers to match format in the sheet
+normalized_headers = [header.lower().strip() for header in section_headers]
+
+OUTPUT_DIR = "sections"
+
+def section_filename(header):
+    return header.replace('/', '_').replace(' ', '_')
+
+def find_headers(df):
+    # One vectorized comparison on column 0; a header seen twice keeps its last position
+    if 0 not in df.columns:
+        return [], pd.Series(dtype=object)
+    cells = df[0].astype(str).str.lower().str.strip()
+    positions = {}
+    for pos in cells.isin(normalized_headers).to_numpy().nonzero()[0]:
+        positions[cells.iat[pos]] = pos
+
+    # Sort the section starts by position
+    return sorted(positions.items(), key=lambda x: x[1]), cells
+
+def warn_missing(header, near=None):
+    # near is the first row that matches the header once whitespace is collapsed, if any
+    name = " ".join(header.split())
+    if near is not None:
+        print(f"⚠️ Section header not matched: '{name}' (row {near} differs only in whitespace; its rows stay in the previous section)")
+    else:
+        print(f"⚠️ Section header not found: '{name}'")
 
-    # Normalize headers to match format in the sheet
-    normalized_headers = [header.lower().strip() for header in section_headers]
+def report_missing(found, cells):
+    # Warn about expected headers that never matched, with a hint when only whitespace differs
+    collapsed = None
+    for header in normalized_headers:
+        if header in found:
+            continue
+        if collapsed is None:
+            # Rows without a first cell have nothing to split
+            collapsed = cells.fillna("").str.split().str.join(" ")
+        near = (collapsed == " ".join(header.split())).to_numpy().nonzero()[0]
+        warn_missing(header, near[0] if len(near) else None)
 
-    # Track where each section starts
-    section_indices = {}
+def iter_sections(df):
+    # Yield (header, frame view) pairs in sheet order without copying the rows
+    starts, cells = find_headers(df)
+    report_missing(dict(starts), cells)
 
-    for idx, row in df.iterrows():
-        cell_text = str(row[0]).lower().strip()
-        if cell_text in normalized_headers:
-            section_indices[cell_text] = idx
+    for i, (header, start_idx) in enumerate(starts):
+        end_idx = starts[i + 1][1] if i + 1 < len(starts) else len(df)
+        yield header, df.iloc[start_idx:end_idx]
 
-    # Sort the section starts by index
-    sorted_sections = sorted(section_indices.items(), key=lambda x: x[1])
+def split_sections(df):
+    # Sections keyed by their normalized header
+    return dict(iter_sections(df))
+
+def pick_sections(df, headers):
+    # One section per header, in order; None for a header the sheet doesn't have (the filer stage)
+    sections = split_sections(df)
+    for header in headers:
+        if header not in sections:
+            print(f"❌ Section not found: {header}")
+    return tuple(sections.get(header) for header in headers)
+
+def route_rows(rows):
+    # Streaming split_sections over (position, row) pairs: yields (header, [(position, row), ...])
+    # as soon as the next header row, or the end of the rows, closes a section, so only one section
+    # is held at a time. split_sections starts a header seen twice at its last occurrence, which
+    # can't be known until the table ends, so a repeated header raises instead.
+    header, section = None, None
+    seen = set()
+    near = {}  # whitespace-collapsed header -> first row position it matches
+    collapsed_headers = {" ".join(header.split()) for header in normalized_headers}
+    for index, (position, row) in enumerate(rows):
+        cell = str(row[0] if row and row[0] != "" else float("nan")).lower().strip()
+        if cell in normalized_headers:
+            if cell in seen:
+                raise ValueError(f"❌ Section header repeated at row {index}: '{' '.join(cell.split())}'. "
+                                 "Only lists with one header per section can be streamed, run without STREAM=1.")
+            seen.add(cell)
+            if header is not None:
+                yield header, section
+            header, section = cell, []
+        else:
+            collapsed = " ".join(cell.split())
+            if collapsed in collapsed_headers:
+                near.setdefault(collapsed, index)
+        # Rows before the first header belong to no section
+        if section is not None:
+            section.append((position, row))
+
+    if header is not None:
+        yield header, section
+    for header in normalized_headers:
+        if header not in seen:
+            warn_missing(header, near.get(" ".join(header.split())))
+
+def section_frame(rows, width):
+    # Routed (position, row) pairs -> the frame split_sections slices out of the whole sheet:
+    # `width` columns, short rows padded, blank cells NaN, index = row position in the sheet.
+    # While streaming, width is the widest row read so far; columns only later rows reach would be blank.
+    text = pd.Series([""]).dtype  # what a column of cell strings is inferred as
+    df = pd.DataFrame(
+        [row + (None,) * (width - len(row)) for _, row in rows],
+        index=[position for position, _ in rows], columns=range(width), dtype=text,
+    )
+    return df.mask(df.eq(""), np.nan)
+
+def save_sections(sections, output_dir=OUTPUT_DIR):
+    # Save each section to its own artifact
+    for header, section_df in sections.items():
+        filename = os.path.join(output_dir, section_filename(header))
+        artifacts.save_frame(section_df, filename, header=False)
+
+def main():
+    # Load the cleaned sheet
+    input_file = "hanggroup_prices_cleaned"
+    if artifacts.find_artifact(input_file)[0] is None:
+        print(f"❌ Input file not found: {input_file}")
+        return
 
-    # Save each section to a new Excel file
-    output_dir = "sections"
-    os.makedirs(output_dir, exist_ok=True)
+    df = artifacts.load_frame(input_file, header=False)
 
-    for i, (header, start_idx) in enumerate(sorted_sections):
-        end_idx = sorted_sections[i + 1][1] if i + 1 < len(sorted_sections) else len(df)
-        section_df = df.iloc[start_idx:end_idx].reset_index(drop=True)
-        filename = os.path.join(output_dir, f"{header.replace('/', '_').replace(' ', '_')}.xlsx")
-        section_df.to_excel(filename, index=False)
+    save_sections(split_sections(df))
 
     print("✅ Done! All sections saved separately.")
 
@@ -1,51 +1,33 @@
-import pandas as pd
-import re
-import os
-from pathlib import Path
+import numpy as np
 
-def main():
-    # Check if input file exists
-    input_file = "sections/google_phones.xlsx"
-    if not os.path.exists(input_file):
-        print(f"❌ Input file not found: {input_file}")
-        return
-
-    # Load Excel file
-    df = pd.read_excel(input_file, header=None)
-
-    def clean_price(val):
-        match = re.search(r"-?\d+(?:\.\d+)?", str(val))
-        return float(match.group(0)) if match else None
+from scripts import artifacts
+from scripts import parsing
+from scripts import records
 
-    def extract_storage(text):
-        match = re.search(r"\b\d+(GB|TB)\b", text, re.IGNORECASE)
-        return match.group(0).upper() if match else ""
+SECTION = "google phones"
+OUTPUT_FILE = "processed/google_Final"
+COLUMNS = [
+    "box_status", "category", "make", "model", "storage", "color",
+    "grade", "lock_status", "active_status", "carrier", "serial_number", "price"
+]
 
-    def extract_lock_status(text):
-        if "unlocked" in text.lower():
-            return "Unlocked"
-        elif "locked" in text.lower():
-            return "Locked"
-        return ""
+def process(df):
+    builder = records.RecordBuilder(COLUMNS)
 
-    def clean_model_name(text):
-        text = re.sub(r"\b\d+(GB|TB)\b", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"\bUnlocked\b|\bLocked\b", "", text, flags=re.IGNORECASE)
-        return " ".join(text.strip().split())
+    # Parse the four price columns for the whole section up front
+    names = parsing.as_str(df[0].where(df[0].notna(), ""))
+    price_matrix = parsing.price_matrix(df[[1, 2, 3, 4]])
 
-    records = []
-
-    for _, row in df.iterrows():
-        col0 = str(row[0]) if pd.notna(row[0]) else ""
+    for col0, prices in zip(names, price_matrix):
         if "pixel" not in col0.lower():
             continue
 
-        storage = extract_storage(col0)
-        lock_status = extract_lock_status(col0)
-        model = clean_model_name(col0)
+        tokens = parsing.tokenize(col0)
+        storage = tokens.storage or ""
+        lock_status = tokens.lock_status or ""
+        model = tokens.model
 
-        prices = [clean_price(row[i]) for i in range(1, 5)]
-        if all(p is None for p in prices):
+        if np.isnan(prices).all():
             continue
 
         box_statuses = ["Sealed", "Unsealed", "Unsealed", "Unsealed", "Unsealed"]
@@ -59,37 +41,36 @@ def main():
             prices[3],  # B uses same as B+
         ]
 
-        for i in range(5):
-            if price_values[i] is not None:
-                records.append({
-                    "box_status": box_statuses[i],
-                    "category": "cellphones",
-                    "make": "Google",
-                    "model": model,
-                    "storage": storage,
-                    "color": "",
-                    "grade": grades[i],
-                    "lock_status": lock_status,
-                    "active_status": active_statuses[i],
-                    "carrier": "",
-                    "serial_number": "",
-                    "price": price_values[i]
-                })
-
-    # Create output directory
-    output_dir = "processed"
-    os.makedirs(output_dir, exist_ok=True)
+        kept = [i for i in range(5) if not np.isnan(price_values[i])]
+        builder.add(
+            len(kept),
+            box_status=[box_statuses[i] for i in kept],
+            category="cellphones", make="Google", model=model, storage=storage, color="",
+            grade=[grades[i] for i in kept],
+            lock_status=lock_status,
+            active_status=[active_statuses[i] for i in kept],
+            carrier="", serial_number="",
+            price=[price_values[i] for i in kept],
+        )
+
+    return builder.build()
+
+def save(final_df, output_file=OUTPUT_FILE):
+    # Save output (creates the directory if needed)
+    path = artifacts.save_frame(final_df, output_file)
+    print(f"✅ Saved to {path}")
 
-    # Save to Excel
-    final_df = pd.DataFrame(records)
-    final_df = final_df[[  # enforce column order
-        "box_status", "category", "make", "model", "storage", "color",
-        "grade", "lock_status", "active_status", "carrier", "serial_number", "price"
-    ]]
+def main():
+    # Check if input file exists
+    input_file = "sections/google_phones"
+    if artifacts.find_artifact(input_file)[0] is None:
+        print(f"❌ Input file not found: {input_file}")
+        return
 
-    final_df.to_excel("processed/google_Final.xlsx", index=False)
+    # Load Excel file
+    df = artifacts.load_frame(input_file, header=False)
 
-    print("✅ Saved to processed/google_Final.xlsx")
+    save(process(df))
 
 if __name__ == "__main__":
     main()
@@ -1,87 +1,78 @@
-import pandas as pd
-import re
-import os
-
-def main():
-    # Check if input file exists
-    input_file = "sections/ipad.xlsx"
-    if not os.path.exists(input_file):
-        print(f"❌ Input file not found: {input_file}")
-        return
-
-    # Load file
-    df = pd.read_excel(input_file, header=None)
-
-    # Helper to extract clean price
-    def clean_price(val):
-        match = re.search(r"-?\d+(?:\.\d+)?", str(val))
-        return float(match.group(0)) if match else None
-
+import numpy as np
+
+from scripts import artifacts
+from scripts import parsing
+from scripts import records
+
+SECTION = "ipad"
+OUTPUT_FILE = "processed/ipad_Final"
+COLUMNS = [
+    "box_status", "category", "make", "model", "storage", "color",
+    "grade", "lock_status", "active_status", "carrier", "price"
+]
+# (box_status, grade, active_status, price column) of each output row; B and B+ share a price
+SLOTS = [
+    ("Sealed", "", "N/A", 0),
+    ("Unsealed", "", "Active", 1),
+    ("Unsealed", "A", "Active", 2),
+    ("Unsealed", "B", "Active", 3),
+    ("Unsealed", "B+", "Active", 3),
+    ("Unsealed", "C", "Active", 4),
+]
+
+def process(df):
     # Initialization
-    records = []
+    builder = records.RecordBuilder(COLUMNS)
+
+    # Parse the price columns for the whole section up front
+    names = parsing.as_str(df[0]).str.strip()
+    price_cells = df.iloc[:, 1:7]
+    no_prices = price_cells.isna().all(axis=1)
+    price_matrix = parsing.price_matrix(price_cells)
 
-    for _, row in df.iterrows():
-        first_col = str(row[0]).strip()
+    for first_col, is_blank, prices in zip(names, no_prices, price_matrix):
         if not first_col.lower().startswith("ipad"):
             continue
 
         # Skip rows with less than 6 price cells
-        if row[1:7].isnull().all():
+        if is_blank:
             continue
 
-        prices = [clean_price(p) for p in row[1:7]]
-
         # Parse model parts
-        parts = first_col.split()
         make = "Apple"
-        storage = ""
-        carrier = ""
-        model_parts = []
-
-        for part in parts:
-            if "gb" in part.lower() or "tb" in part.lower():
-                storage = part.upper()
-            elif part.lower() == "verizon":
-                carrier = "Verizon"
-            else:
-                model_parts.append(part)
-
-        model = " ".join(model_parts).replace("Verizon", "").strip()
-
-        # Construct records
-        record_list = [
-            {"box_status": "Sealed", "category": "tablets", "make": make, "model": model, "storage": storage,
-             "color": "", "grade": "", "lock_status": "", "active_status": "N/A", "carrier": carrier, "price": prices[0]},
-            {"box_status": "Unsealed", "category": "tablets", "make": make, "model": model, "storage": storage,
-             "color": "", "grade": "", "lock_status": "", "active_status": "Active", "carrier": carrier, "price": prices[1]},
-            {"box_status": "Unsealed", "category": "tablets", "make": make, "model": model, "storage": storage,
-             "color": "", "grade": "A", "lock_status": "", "active_status": "Active", "carrier": carrier, "price": prices[2]},
-            {"box_status": "Unsealed", "category": "tablets", "make": make, "model": model, "storage": storage,
-             "color": "", "grade": "B", "lock_status": "", "active_status": "Active", "carrier": carrier, "price": prices[3]},
-            {"box_status": "Unsealed", "category": "tablets", "make": make, "model": model, "storage": storage,
-             "color": "", "grade": "B+", "lock_status": "", "active_status": "Active", "carrier": carrier, "price": prices[3]},
-            {"box_status": "Unsealed", "category": "tablets", "make": make, "model": model, "storage": storage,
-             "color": "", "grade": "C", "lock_status": "", "active_status": "Active", "carrier": carrier, "price": prices[4]}
-        ]
-
-        # Only append records with valid price
-        for rec in record_list:
-            if rec["price"] is not None:
-                records.append(rec)
+        storage, _, _, (carrier,), model = parsing.tokenize_ipad(first_col)
+
+        # Only add records with valid price
+        kept = [slot for slot in SLOTS if not np.isnan(prices[slot[3]])]
+        builder.add(
+            len(kept),
+            box_status=[box_status for box_status, _, _, _ in kept],
+            category="tablets", make=make, model=model, storage=storage, color="",
+            grade=[grade for _, grade, _, _ in kept],
+            lock_status="",
+            active_status=[active_status for _, _, active_status, _ in kept],
+            carrier=carrier,
+            price=[prices[column] for _, _, _, column in kept],
+        )
+
+    return builder.build()
+
+def save(final_df, output_file=OUTPUT_FILE):
+    # Save output (creates the directory if needed)
+    path = artifacts.save_frame(final_df, output_file)
+    print(f"✅ Saved {len(final_df)} records to {path}")
 
-    # Create output directory
-    output_dir = "processed"
-    os.makedirs(output_dir, exist_ok=True)
+def main():
+    # Check if input file exists
+    input_file = "sections/ipad"
+    if artifacts.find_artifact(input_file)[0] is None:
+        print(f"❌ Input file not found: {input_file}")
+        return
 
-    # Save output
-    final_df = pd.DataFrame(records)
-    final_df = final_df[[
-        "box_status", "category", "make", "model", "storage", "color",
-        "grade", "lock_status", "active_status", "carrier", "price"
-    ]]
+    # Load file
+    df = artifacts.load_frame(input_file, header=False)
 
-    final_df.to_excel("processed/ipad_Final.xlsx", index=False)
-    print(f"✅ Saved {len(final_df)} records to processed/ipad_Final.xlsx")
+    save(process(df))
 
 if __name__ == "__main__":
     main()
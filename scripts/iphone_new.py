@@ -1,160 +1,106 @@
+import numpy as np
 import pandas as pd
-import re
-import os
+
+from scripts import artifacts
+from scripts import parsing
+from scripts import variants
+
+SECTION = "iphone new (us spec)"
+OUTPUT_FILE = "processed/iPhone_New_Final"
+
+# Output rows per priced input row, in the order they're emitted
+VARIANTS = [
+    {"slot": "sealed", "Box Status": "Sealed", "Activate Status": "Non-Active"},
+    {"slot": "unsealed", "Box Status": "Unsealed", "Activate Status": "Active"},
+    # Unlocked rows get a Red colour variant at the carried Red discount
+    {"slot": "sealed", "when": "has_red", "adjust": "red", "sign": -1,
+     "Color": "Red", "Box Status": "Sealed", "Activate Status": "Non-Active", "Lock Status": "Unlocked"},
+    {"slot": "unsealed", "when": "has_red", "adjust": "red", "sign": -1,
+     "Color": "Red", "Box Status": "Unsealed", "Activate Status": "Active", "Lock Status": "Unlocked"},
+    # Locked rows get Flex (+) and Cricket (-) carrier variants
+    {"slot": "sealed", "when": "has_flex", "adjust": "flex", "sign": 1,
+     "Box Status": "Sealed", "Activate Status": "Non-Active", "Lock Status": "Locked", "Carrier": "Flex"},
+    {"slot": "unsealed", "when": "has_flex", "adjust": "flex", "sign": 1,
+     "Box Status": "Unsealed", "Activate Status": "Active", "Lock Status": "Locked", "Carrier": "Flex"},
+    {"slot": "sealed", "when": "has_cricket", "adjust": "cricket", "sign": -1,
+     "Box Status": "Sealed", "Activate Status": "Non-Active", "Lock Status": "Locked", "Carrier": "Cricket"},
+    {"slot": "unsealed", "when": "has_cricket", "adjust": "cricket", "sign": -1,
+     "Box Status": "Unsealed", "Activate Status": "Active", "Lock Status": "Locked", "Carrier": "Cricket"},
+]
+COLUMNS = [
+    "S.No", "Make", "Model", "Storage", "Color", "Box Status", "Activate Status",
+    "Category", "Grade", "Lock Status", "Carrier", "Price"
+]
+
+def process(df):
+    def is_price(col):
+        # "$123" strings, or numbers from a typed sheet
+        is_text = col.map(lambda val: isinstance(val, str))
+        return (is_text & parsing.as_str(col).str.contains(parsing.DOLLAR_AMOUNT)) | (~is_text & col.notna())
+
+    name = parsing.as_str(df[0].where(df[0].notna(), ""))
+    col4 = parsing.as_str(df[3].where(df[3].notna(), ""))
+    lower_name = name.str.lower()
+    lower_col4 = col4.str.lower()
+
+    # Lock status headers ("iPhone Unlocked" / "iPhone Locked") switch the block
+    is_iphone = lower_name.str.startswith("iphone")
+    unlocked_header = is_iphone & lower_name.str.contains("unlocked", regex=False)
+    locked_header = is_iphone & ~unlocked_header & lower_name.str.contains("locked", regex=False)
+    lock_status = variants.carry_forward(
+        pd.Series(np.select([unlocked_header, locked_header], ["Unlocked", "Locked"], None), index=df.index)
+    )
+
+    # Valid iPhone rows with two prices
+    priced = is_iphone & ~unlocked_header & ~locked_header & is_price(df[1]) & is_price(df[2])
+    unlocked_row = priced & lock_status.eq("Unlocked")
+
+    # "$123" amounts of both price columns and the modifier column in one pass; 0 when missing.
+    # Modifiers in the 4th column carry forward: Flex/Cricket clear after an Unlocked row, Red at the Locked header
+    amounts = np.nan_to_num(parsing.price_matrix(df[[1, 2, 3]], parsing.DOLLAR_PRICE)).astype("int64")
+    modifier = pd.Series(amounts[:, 2], index=df.index)
+    flex = variants.carry_forward(modifier.where(lower_col4.str.contains("flex", regex=False)), unlocked_row)
+    cricket = variants.carry_forward(modifier.where(lower_col4.str.contains("cricket", regex=False)), unlocked_row)
+    red = variants.carry_forward(modifier.where(lower_col4.str.contains("red", regex=False)), locked_header)
+
+    rows = priced.to_numpy()
+    tokens = pd.DataFrame([parsing.tokenize_iphone(text) for text in name[rows]],
+                          columns=parsing.Tokens._fields, index=name.index[rows])
+    lock = lock_status[rows]
+    base = pd.DataFrame({
+        "S.No": "", "Make": "Apple",
+        "Model": tokens["model"],
+        "Storage": tokens["storage"],
+        "Color": tokens["color"],
+        "Category": "Cellphone", "Grade": "",
+        "Lock Status": lock.astype(object).where(lock.notna(), None),
+        "Carrier": None,
+        "sealed": amounts[rows, 0],
+        "unsealed": amounts[rows, 1],
+        "red": red[rows], "flex": flex[rows], "cricket": cricket[rows],
+        "has_red": lock.eq("Unlocked") & red[rows].notna(),
+        "has_flex": lock.eq("Locked") & flex[rows].notna(),
+        "has_cricket": lock.eq("Locked") & cricket[rows].notna(),
+    })
+
+    return variants.expand(base, VARIANTS, COLUMNS)
+
+def save(final_df, output_file=OUTPUT_FILE):
+    # Save output (creates the directory if needed)
+    path = artifacts.save_frame(final_df, output_file)
+    print(f"✅ {path} created with Carrier column and clean Lock Status.")
 
 def main():
     # Check if input file exists
-    input_file = "sections/iphone_new_(us_spec).xlsx"
-    if not os.path.exists(input_file):
+    input_file = "sections/iphone_new_(us_spec)"
+    if artifacts.find_artifact(input_file)[0] is None:
         print(f"❌ Input file not found: {input_file}")
         return
 
     # Load file
-    df = pd.read_excel(input_file, header=None)
-
-    # Helper functions
-    def is_price(val):
-        if isinstance(val, str):
-            return re.search(r"\$\d+", val)
-        elif isinstance(val, (int, float)):
-            return not pd.isna(val)
-        return False
-
-    def extract_price_num(text):
-        match = re.search(r"\$(-?\d+)", str(text))
-        return int(match.group(1)) if match else 0
-
-    def extract_storage(text):
-        match = re.search(r"(\d+GB|\d+TB)", text, re.IGNORECASE)
-        return match.group(1).upper() if match else None
-
-    def extract_color(text):
-        known_colors = ["Red", "Desert", "Black", "White", "Gold", "Silver", "Blue", "Green", "Purple", "Yellow"]
-        for color in known_colors:
-            if color.lower() in text.lower():
-                return color
-        return "Other"
-
-    def clean_model(text):
-        text = re.sub(r"iPhone", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"\b(\d+GB|\d+TB)\b", "", text)
-        text = re.sub(rf"\b({'|'.join(['Red', 'Desert', 'Black', 'White', 'Gold', 'Silver', 'Blue', 'Green', 'Purple', 'Yellow', 'Others'])})\b", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"\s+", " ", text).strip()
-        return text
-
-    # Initialization
-    records = []
-    current_lock_status = None
-    current_flex = None
-    current_cricket = None
-    current_red = None
-
-    # Main loop
-    for idx, row in df.iterrows():
-        name = str(row[0]) if pd.notna(row[0]) else ""
-        price1 = row[1]
-        price2 = row[2]
-        col4 = str(row[3]) if pd.notna(row[3]) else ""
-
-        # Always update flex/cricket modifiers if found
-        if "flex" in col4.lower():
-            current_flex = extract_price_num(col4)
-        if "cricket" in col4.lower():
-            current_cricket = extract_price_num(col4)
-        if "red" in col4.lower():
-            current_red = extract_price_num(col4)
-
-        if not name.lower().startswith("iphone"):
-            continue
-
-        # Update lock status from headers
-        if "unlocked" in name.lower():
-            current_lock_status = "Unlocked"
-            continue
-        elif "locked" in name.lower():
-            current_lock_status = "Locked"
-            current_red = None
-            continue
-
-        # Process valid iPhone rows with prices
-        if is_price(price1) and is_price(price2):
-            storage = extract_storage(name)
-            color = extract_color(name)
-            model = clean_model(name)
-            base_price1 = extract_price_num(price1)
-            base_price2 = extract_price_num(price2)
-
-            # Base rows
-            records.append({
-                "S.No": "", "Make": "Apple", "Model": model, "Storage": storage,
-                "Color": color, "Box Status": "Sealed", "Activate Status": "Non-Active",
-                "Category": "Cellphone", "Grade": "", "Lock Status": current_lock_status,
-                "Carrier": None, "Price": base_price1
-            })
-
-            records.append({
-                "S.No": "", "Make": "Apple", "Model": model, "Storage": storage,
-                "Color": color, "Box Status": "Unsealed", "Activate Status": "Active",
-                "Category": "Cellphone", "Grade": "", "Lock Status": current_lock_status,
-                "Carrier": None, "Price": base_price2
-            })
-
-            if current_lock_status == "Unlocked":
-                current_flex = None
-                current_cricket = None
-                if current_red is not None:
-                    records.append({
-                        "S.No": "", "Make": "Apple", "Model": model, "Storage": storage,
-                        "Color": "Red", "Box Status": "Sealed", "Activate Status": "Non-Active",
-                        "Category": "Cellphone", "Grade": "", "Lock Status": "Unlocked",
-                        "Carrier": None, "Price": base_price1 - current_red
-                    })
-                    records.append({
-                        "S.No": "", "Make": "Apple", "Model": model, "Storage": storage,
-                        "Color": "Red", "Box Status": "Unsealed", "Activate Status": "Active",
-                        "Category": "Cellphone", "Grade": "", "Lock Status": "Unlocked",
-                        "Carrier": None, "Price": base_price2 - current_red
-                    })
-
-            # Apply modifiers only if in Locked mode
-            if current_lock_status == "Locked":
-                if current_flex is not None:
-                    records.append({
-                        "S.No": "", "Make": "Apple", "Model": model, "Storage": storage,
-                        "Color": color, "Box Status": "Sealed", "Activate Status": "Non-Active",
-                        "Category": "Cellphone", "Grade": "", "Lock Status": "Locked",
-                        "Carrier": "Flex", "Price": base_price1 + current_flex
-                    })
-                    records.append({
-                        "S.No": "", "Make": "Apple", "Model": model, "Storage": storage,
-                        "Color": color, "Box Status": "Unsealed", "Activate Status": "Active",
-                        "Category": "Cellphone", "Grade": "", "Lock Status": "Locked",
-                        "Carrier": "Flex", "Price": base_price2 + current_flex
-                    })
-
-                if current_cricket is not None:
-                    records.append({
-                        "S.No": "", "Make": "Apple", "Model": model, "Storage": storage,
-                        "Color": color, "Box Status": "Sealed", "Activate Status": "Non-Active",
-                        "Category": "Cellphone", "Grade": "", "Lock Status": "Locked",
-                        "Carrier": "Cricket", "Price": base_price1 - current_cricket
-                    })
-                    records.append({
-                        "S.No": "", "Make": "Apple", "Model": model, "Storage": storage,
-                        "Color": color, "Box Status": "Unsealed", "Activate Status": "Active",
-                        "Category": "Cellphone", "Grade": "", "Lock Status": "Locked",
-                        "Carrier": "Cricket", "Price": base_price2 - current_cricket
-                    })
-
-    # Create output directory
-    output_dir = "processed"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Save output
-    final_df = pd.DataFrame(records)
-    final_df.to_excel("processed/iPhone_New_Final.xlsx", index=False)
+    df = artifacts.load_frame(input_file, header=False)
 
-    print("✅ iPhone_New_Final.xlsx created with Carrier column and clean Lock Status.")
+    save(process(df))
 
 if __name__ == "__main__":
     main()
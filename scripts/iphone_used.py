@@ -1,150 +1,94 @@
+import numpy as np
 import pandas as pd
-import re
-import os
+
+from scripts import artifacts
+from scripts import parsing
+from scripts import variants
+
+SECTION = "iphone used (us spec)"
+OUTPUT_FILE = "processed/iPhone_Used_Final"
+
+# Grade labels, one per price column
+GRADE_LABELS = ["A+", "B+", "B", "C", "D", "HSO/Swap"]
+
+# Six graded rows per priced input row, then Flex (+) and Cricket (-) copies for locked phones
+VARIANTS = (
+    [{"slot": f"grade_{i}", "Grade": grade} for i, grade in enumerate(GRADE_LABELS)]
+    + [{"slot": f"grade_{i}", "when": "has_flex", "adjust": "flex", "sign": 1,
+        "Grade": grade, "Lock Status": "Locked", "Carrier": "Flex"} for i, grade in enumerate(GRADE_LABELS)]
+    + [{"slot": f"grade_{i}", "when": "has_cricket", "adjust": "cricket", "sign": -1,
+        "Grade": grade, "Lock Status": "Locked", "Carrier": "Cricket"} for i, grade in enumerate(GRADE_LABELS)]
+)
+COLUMNS = [
+    "S.No", "Make", "Model", "Storage", "Color", "Box Status", "Activate Status",
+    "Category", "Grade", "Lock Status", "Carrier", "Price"
+]
+
+def process(df):
+    # Helper function to check if value is a price
+    def is_price(col):
+        return parsing.as_str(col).str.contains(parsing.AMOUNT)
+
+    col0 = parsing.as_str(df[0]).str.strip()
+    col1 = parsing.as_str(df[1].where(df[1].notna(), "")).str.strip()
+    lower0 = col0.str.lower()
+
+    # Rows with 6 prices, skipping blanks, the grade header/explanation and Flex rows
+    skipped = (col0 == "") | lower0.str.startswith("used") | lower0.str.contains("grade", regex=False) \
+        | lower0.str.contains("flex", regex=False)
+    priced = ~skipped
+    for i in range(1, 7):
+        priced &= is_price(df[i])
+
+    names = col0[priced.to_numpy()]
+    tokens = pd.DataFrame([parsing.tokenize(text) for text in names],
+                          columns=parsing.Tokens._fields, index=names.index)
+    valid = (tokens["model"] != "0").reindex(col0.index, fill_value=False)
+    lock_status = tokens["lock_status"].fillna("-").reindex(col0.index)
+
+    # Flex (1st column) and Cricket (2nd column) carry forward until the next Unlocked row
+    unlocked_row = valid & lock_status.eq("Unlocked")
+    # Modifier amounts like "Flex +$20" / "Cricket -$30"; 0 when there's no number
+    amounts = np.nan_to_num(parsing.price_matrix(df[[0, 1]], parsing.INTEGER)).astype("int64")
+    flex = variants.carry_forward(
+        pd.Series(amounts[:, 0], index=df.index).where(lower0.str.contains("flex", regex=False)), unlocked_row)
+    cricket = variants.carry_forward(
+        pd.Series(amounts[:, 1], index=df.index).where(col1.str.lower().str.contains("cricket", regex=False)), unlocked_row)
+
+    rows = valid.to_numpy()
+    lock = lock_status[rows]
+    base = pd.DataFrame({
+        "S.No": "", "Make": "Apple",
+        "Model": tokens["model"][valid[priced].to_numpy()],
+        "Storage": tokens["storage"][valid[priced].to_numpy()],
+        "Color": None, "Box Status": "Used", "Activate Status": "Active", "Category": "Cellphone",
+        "Lock Status": lock, "Carrier": None,
+        "flex": flex[rows], "cricket": cricket[rows],
+        "has_flex": lock.eq("Locked") & flex[rows].notna(),
+        "has_cricket": lock.eq("Locked") & cricket[rows].notna(),
+    })
+    grade_prices = parsing.digit_matrix(df.loc[rows, list(range(1, 7))])
+    for i in range(6):
+        base[f"grade_{i}"] = grade_prices[:, i]
+
+    return variants.expand(base, VARIANTS, COLUMNS)
+
+def save(final_df, output_file=OUTPUT_FILE):
+    # Save output (creates the directory if needed)
+    path = artifacts.save_frame(final_df, output_file)
+    print(f"✅ {path} created with clean Lock Status and Carrier column.")
 
 def main():
     # Check if input file exists
-    input_file = "sections/iphone_used_(us_spec).xlsx"
-    if not os.path.exists(input_file):
+    input_file = "sections/iphone_used_(us_spec)"
+    if artifacts.find_artifact(input_file)[0] is None:
         print(f"❌ Input file not found: {input_file}")
         return
 
     # Load file
-    df = pd.read_excel(input_file, header=None)
+    df = artifacts.load_frame(input_file, header=False)
 
-    # Helper function to check if value is a price
-    def is_price(val):
-        return bool(re.search(r"\$?\d+", str(val)))
-
-    # Extract price number from string like "$30"
-    def extract_price_num(text):
-        match = re.search(r"-?\d+", str(text))
-        return int(match.group(0)) if match else 0
-
-    # Grade labels
-    grade_labels = ["A+", "B+", "B", "C", "D", "HSO/Swap"]
-
-    # Extract storage from model
-    def extract_storage(text):
-        match = re.search(r"\b(\d+(GB|TB))\b", text, re.IGNORECASE)
-        return match.group(1).upper() if match else None
-
-    # Extract lock status
-    def extract_lock_status(text):
-        if "unlocked" in text.lower():
-            return "Unlocked"
-        elif "locked" in text.lower():
-            return "Locked"
-        return "-"
-
-    # Clean model text
-    def clean_model(text):
-        text = re.sub(r"\b\d+(GB|TB)\b", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"\bUnlocked\b|\bLocked\b", "", text, flags=re.IGNORECASE)
-        return " ".join(text.strip().split())
-
-    # Init
-    records = []
-    sno = 1
-    current_flex = None
-    current_cricket = None
-
-    # Loop
-    for idx, row in df.iterrows():
-        col0 = str(row[0]).strip()
-        col1 = str(row[1]).strip() if pd.notna(row[1]) else ""
-
-        # Detect and store Flex and Cricket modifiers
-        if "flex" in col0.lower():
-            current_flex = extract_price_num(col0)
-        if "cricket" in col1.lower():
-            current_cricket = extract_price_num(col1)
-        if col0 == "" or col0.lower().startswith("used") or "grade" in col0.lower() or "flex" in col0.lower():
-            continue
-
-        # Process data rows with 6 prices
-        if all(is_price(row[i]) for i in range(1, 7)):
-            storage = extract_storage(col0)
-            lock_status = extract_lock_status(col0)
-            model = clean_model(col0)
-
-            if model == "0" or model == None:
-                continue
-
-            base_prices = []
-            for i in range(6):
-                price_val = re.sub(r"[^\d.]", "", str(row[i + 1]))
-                price_val = float(price_val) if price_val else 0
-                base_prices.append(price_val)
-
-                # Base row (no carrier)
-                records.append({
-                    "S.No": "",
-                    "Make": "Apple",
-                    "Model": model,
-                    "Storage": storage,
-                    "Color": None,
-                    "Box Status": "Used",
-                    "Activate Status": "Active",
-                    "Category": "Cellphone",
-                    "Grade": grade_labels[i],
-                    "Lock Status": lock_status,
-                    "Carrier": None,
-                    "Price": price_val
-                })
-                sno += 1
-
-            if lock_status == "Unlocked":
-                current_flex = None
-                current_cricket = None
-
-            # For locked phones, apply Flex and Cricket modifiers
-            if lock_status == "Locked":
-                if current_flex is not None:
-                    for i in range(6):
-                        records.append({
-                            "S.No": "",
-                            "Make": "Apple",
-                            "Model": model,
-                            "Storage": storage,
-                            "Color": None,
-                            "Box Status": "Used",
-                            "Activate Status": "Active",
-                            "Category": "Cellphone",
-                            "Grade": grade_labels[i],
-                            "Lock Status": "Locked",
-                            "Carrier": "Flex",
-                            "Price": base_prices[i] + current_flex
-                        })
-                        sno += 1
-
-                if current_cricket is not None:
-                    for i in range(6):
-                        records.append({
-                            "S.No": "",
-                            "Make": "Apple",
-                            "Model": model,
-                            "Storage": storage,
-                            "Color": None,
-                            "Box Status": "Used",
-                            "Activate Status": "Active",
-                            "Category": "Cellphone",
-                            "Grade": grade_labels[i],
-                            "Lock Status": "Locked",
-                            "Carrier": "Cricket",
-                            "Price": base_prices[i] - current_cricket
-                        })
-                        sno += 1
-
-    # Create output directory
-    output_dir = "processed"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Save result
-    final_df = pd.DataFrame(records)
-    final_df.to_excel("processed/iPhone_Used_Final.xlsx", index=False)
-
-    print("✅ iPhone_Used_Final.xlsx created with clean Lock Status and Carrier column.")
+    save(process(df))
 
 if __name__ == "__main__":
     main()
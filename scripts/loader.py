@@ -0,0 +1,388 @@
+import time
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from scripts import metrics
+
+# Supported ways of pushing a frame into Postgres
+LOAD_MODES = ["copy", "values"]
+
+# Rows rendered to CSV at a time while COPY reads a frame
+COPY_CHUNK_ROWS = 10000
+
+class FrameStream:
+    # File-like CSV view of a frame for copy_expert: rows are rendered a chunk at a time as COPY
+    # reads them, so the frame never exists as one CSV string
+    def __init__(self, df, chunk_rows=COPY_CHUNK_ROWS):
+        self.df = df
+        self.chunk_rows = chunk_rows
+        self.next_row = 0
+        self.buffer = ""
+        self.pos = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return "".join(iter(lambda: self.read(1 << 20), ""))
+
+        if self.pos >= len(self.buffer):
+            if self.next_row >= len(self.df):
+                return ""
+            chunk = self.df.iloc[self.next_row:self.next_row + self.chunk_rows]
+            self.buffer = chunk.to_csv(index=False, header=False)
+            self.pos = 0
+            self.next_row += self.chunk_rows
+            metrics.count_bytes(written=len(self.buffer))
+
+        data = self.buffer[self.pos:self.pos + size]
+        self.pos += len(data)
+        return data
+
+def copy_frame(cursor, df, table="devices"):
+    # Stream the whole frame through a single COPY ... FROM STDIN
+    columns = ", ".join(df.columns)
+    sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    cursor.copy_expert(sql, FrameStream(df))
+
+def insert_values(cursor, df, table="devices", page_size=1000):
+    # Fallback: batched multi-row INSERTs, NaN sent as NULL
+    columns = ", ".join(df.columns)
+    sql = f"INSERT INTO {table} ({columns}) VALUES %s"
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    execute_values(cursor, sql, rows, page_size=page_size)
+
+def load_frame(cursor, df, mode="copy", table="devices"):
+    # Load a frame with the given mode and return the elapsed seconds
+    start = time.perf_counter()
+    if mode == "copy":
+        copy_frame(cursor, df, table)
+    elif mode == "values":
+        insert_values(cursor, df, table)
+    else:
+        raise ValueError(f"❌ Unknown load mode: {mode} (expected one of {LOAD_MODES})")
+    return time.perf_counter() - start
+
+def rows_per_second(rows, elapsed):
+    return rows / elapsed if elapsed > 0 else float(rows)
+
+# DDL this process has already run; skipped afterwards so repeated and concurrent loads don't
+# re-run CREATE INDEX / CREATE OR REPLACE VIEW (which lock against each other)
+SCHEMA_READY = set()
+
+def ensure_schema(cursor, ddl):
+    if ddl not in SCHEMA_READY:
+        cursor.execute(ddl)
+        SCHEMA_READY.add(ddl)
+
+def forget_cached_state():
+    # Tables and dimension codes created inside a rolled-back transaction no longer exist
+    SCHEMA_READY.clear()
+    DIMENSION_CODES.clear()
+
+# Natural key of a price row; the delta loader keeps validity intervals per key
+NATURAL_KEY = [
+    "make", "model", "storage", "color", "grade", "lock_status",
+    "active_status", "carrier", "box_status", "serial_number"
+]
+PRICE_COLUMNS = ["category"] + NATURAL_KEY + ["price"]
+
+# NULL and "" hash the same; the unit separator keeps adjacent fields apart
+SKU_KEY_SQL = "md5(" + " || chr(31) || ".join(f"coalesce({col}, '')" for col in NATURAL_KEY) + ")"
+
+DELTA_DDL = f"""
+CREATE TABLE IF NOT EXISTS device_prices (
+    sku_key text NOT NULL,
+    {", ".join(f"{col} text" for col in PRICE_COLUMNS[:-1])},
+    price numeric,
+    valid_from date NOT NULL,
+    valid_to date,
+    source_file text,
+    PRIMARY KEY (sku_key, valid_from)
+);
+ALTER TABLE device_prices ADD COLUMN IF NOT EXISTS source_file text;
+CREATE INDEX IF NOT EXISTS device_prices_current ON device_prices (sku_key) WHERE valid_to IS NULL;
+CREATE INDEX IF NOT EXISTS device_prices_current_by_file ON device_prices (source_file) WHERE valid_to IS NULL;
+"""
+
+# The staging table lives for one transaction, so it's created on every delta load
+DELTA_STAGING_DDL = f"""
+CREATE TEMP TABLE IF NOT EXISTS device_prices_staging (
+    row_no bigserial,
+    {", ".join(f"{col} text" for col in PRICE_COLUMNS[:-1])},
+    price numeric,
+    fetched_at date
+) ON COMMIT DROP;
+TRUNCATE device_prices_staging;
+"""
+
+# Latest row per key from the staged frame
+DELTA_INCOMING = f"""
+    SELECT DISTINCT ON (sku_key) *
+    FROM (SELECT {SKU_KEY_SQL} AS sku_key, * FROM device_prices_staging) staged
+    ORDER BY sku_key, row_no DESC
+"""
+
+# Close the open interval of every key whose price moved
+DELTA_CLOSE = f"""
+UPDATE device_prices p SET valid_to = i.fetched_at
+FROM ({DELTA_INCOMING}) i
+WHERE p.sku_key = i.sku_key
+  AND p.valid_to IS NULL
+  AND p.valid_from < i.fetched_at
+  AND p.price IS DISTINCT FROM i.price
+"""
+
+# Close the open interval of every key the file listed before but no longer does
+DELTA_DELIST = f"""
+UPDATE device_prices p SET valid_to = s.fetched_at
+FROM (SELECT max(fetched_at) AS fetched_at FROM device_prices_staging) s
+WHERE p.source_file = %(source_file)s
+  AND p.valid_to IS NULL
+  AND p.valid_from < s.fetched_at
+  AND NOT EXISTS (SELECT 1 FROM ({DELTA_INCOMING}) i WHERE i.sku_key = p.sku_key)
+"""
+
+# Open rows loaded before device_prices had source_file belong to the file that lists them now
+DELTA_ADOPT = f"""
+UPDATE device_prices p SET source_file = %(source_file)s
+FROM ({DELTA_INCOMING}) i
+WHERE p.sku_key = i.sku_key
+  AND p.valid_to IS NULL
+  AND p.source_file IS NULL
+"""
+
+# Open a new interval for new or changed keys; a same-day rerun overwrites its own row.
+# Keys already loaded for a later date are left alone so out-of-order loads can't reopen them.
+DELTA_INSERT = f"""
+INSERT INTO device_prices (sku_key, {", ".join(PRICE_COLUMNS)}, valid_from, source_file)
+SELECT i.sku_key, {", ".join(f"i.{col}" for col in PRICE_COLUMNS)}, i.fetched_at, %(source_file)s
+FROM ({DELTA_INCOMING}) i
+WHERE NOT EXISTS (
+    SELECT 1 FROM device_prices p
+    WHERE p.sku_key = i.sku_key
+      AND ((p.valid_to IS NULL AND p.price IS NOT DISTINCT FROM i.price) OR p.valid_from > i.fetched_at)
+)
+ON CONFLICT (sku_key, valid_from) DO UPDATE
+    SET price = EXCLUDED.price, valid_to = NULL, source_file = EXCLUDED.source_file
+"""
+
+def upsert_delta(cursor, df, source_file):
+    # Write only new or changed prices of one processed file into device_prices, and close the
+    # keys that file no longer lists. df must be the whole file: keys missing from it are delisted.
+    # Returns (written, closed, delisted, elapsed).
+    start = time.perf_counter()
+    ensure_schema(cursor, DELTA_DDL)
+    cursor.execute(DELTA_STAGING_DDL)
+    copy_frame(cursor, df[PRICE_COLUMNS + ["fetched_at"]], "device_prices_staging")
+
+    params = {"source_file": source_file}
+    cursor.execute(DELTA_ADOPT, params)
+    cursor.execute(DELTA_CLOSE)
+    closed = cursor.rowcount
+    cursor.execute(DELTA_DELIST, params)
+    delisted = cursor.rowcount
+    cursor.execute(DELTA_INSERT, params)
+    written = cursor.rowcount
+    return written, closed, delisted, time.perf_counter() - start
+
+# Wide price matrix: one row per SKU and box state with one price column per grade, instead of
+# one row per grade. device_price_matrix_long unpivots it back into the devices row shape.
+WIDE_GRADES = {
+    "": "price_base",  # ungraded (sealed/unsealed) price
+    "A+": "price_a_plus",
+    "A": "price_a",
+    "B+": "price_b_plus",
+    "B": "price_b",
+    "C": "price_c",
+    "D+": "price_d_plus",
+    "D": "price_d",
+    "E": "price_e",
+    "HSO/Swap": "price_hso_swap",
+    "mdm": "price_mdm",
+}
+WIDE_KEY = [
+    "box_status", "category", "make", "model", "storage", "color",
+    "lock_status", "active_status", "carrier", "serial_number", "fetched_at"
+]
+WIDE_COLUMNS = WIDE_KEY[:-1] + list(WIDE_GRADES.values()) + ["fetched_at"]
+
+WIDE_GRADE_ROWS = ",\n        ".join(
+    f"({'NULL::text' if grade == '' else repr(grade)}, m.{col})" for grade, col in WIDE_GRADES.items()
+)
+
+WIDE_DDL = f"""
+CREATE TABLE IF NOT EXISTS device_price_matrix (
+    {", ".join(f"{col} text" for col in WIDE_KEY[:-1])},
+    {", ".join(f"{col} numeric" for col in WIDE_GRADES.values())},
+    fetched_at date
+);
+CREATE INDEX IF NOT EXISTS device_price_matrix_lookup ON device_price_matrix (make, model, storage, fetched_at);
+CREATE OR REPLACE VIEW device_price_matrix_long AS
+SELECT m.box_status, m.category, m.make, m.model, m.storage, m.color, g.grade, m.lock_status,
+       m.active_status, m.carrier, g.price, m.serial_number, m.fetched_at
+FROM device_price_matrix m
+CROSS JOIN LATERAL (
+    VALUES
+        {WIDE_GRADE_ROWS}
+) AS g (grade, price)
+WHERE g.price IS NOT NULL;
+"""
+
+def to_wide(df):
+    # Prepared long frame -> one row per WIDE_KEY with the price of each grade in its own column.
+    # A repeated (key, grade) keeps its last price, like the delta loader.
+    grades = df["grade"].astype(object).where(df["grade"].notna(), "")
+    unknown = sorted(set(grades) - set(WIDE_GRADES))
+    if unknown:
+        raise ValueError(f"❌ No wide price column for grade(s): {unknown}")
+
+    df = df.assign(grade=grades).drop_duplicates(WIDE_KEY + ["grade"], keep="last")
+    groups = df.groupby(WIDE_KEY, dropna=False, sort=False).ngroup().to_numpy()
+    _, first = np.unique(groups, return_index=True)
+
+    slots = df["grade"].map({grade: i for i, grade in enumerate(WIDE_GRADES)}).to_numpy()
+    prices = np.full((len(first), len(WIDE_GRADES)), np.nan)
+    prices[groups, slots] = pd.to_numeric(df["price"]).to_numpy(dtype=float)
+
+    wide = df.iloc[first][WIDE_KEY].reset_index(drop=True)
+    for i, col in enumerate(WIDE_GRADES.values()):
+        wide[col] = prices[:, i]
+    return wide[WIDE_COLUMNS]
+
+def from_wide(wide):
+    # Wide matrix -> long rows in the devices column order (the Python side of device_price_matrix_long)
+    long = wide.melt(id_vars=WIDE_KEY, value_vars=list(WIDE_GRADES.values()),
+                     var_name="grade", value_name="price")
+    long = long[long["price"].notna()]
+    long["grade"] = long["grade"].map({col: grade or None for grade, col in WIDE_GRADES.items()})
+    return long[["box_status", "category", "make", "model", "storage", "color", "grade", "lock_status",
+                 "active_status", "carrier", "price", "serial_number", "fetched_at"]].reset_index(drop=True)
+
+def load_wide(cursor, df):
+    # Pivot a prepared frame into device_price_matrix; returns (rows written, elapsed)
+    start = time.perf_counter()
+    ensure_schema(cursor, WIDE_DDL)
+    wide = to_wide(df)
+    copy_frame(cursor, wide, "device_price_matrix")
+    return len(wide), time.perf_counter() - start
+
+# MacBook price lines with their serials in one indexed array instead of one row per serial
+SERIAL_PRICE_COLUMNS = [
+    "box_status", "category", "make", "model", "storage", "color",
+    "grade", "lock_status", "active_status", "carrier", "price"
+]
+
+SERIAL_DDL = f"""
+CREATE TABLE IF NOT EXISTS device_serial_prices (
+    {", ".join(f"{col} text" for col in SERIAL_PRICE_COLUMNS[:-1])},
+    price numeric,
+    serial_numbers text[] NOT NULL,
+    fetched_at date
+);
+CREATE INDEX IF NOT EXISTS device_serial_prices_serials ON device_serial_prices USING gin (serial_numbers);
+CREATE OR REPLACE VIEW device_serial_prices_long AS
+SELECT {", ".join(f"p.{col}" for col in SERIAL_PRICE_COLUMNS)}, s.serial_number, p.fetched_at
+FROM device_serial_prices p
+CROSS JOIN LATERAL unnest(p.serial_numbers) AS s (serial_number);
+"""
+
+def serial_array(serials):
+    # "C02X1 C02X2" -> {C02X1,C02X2}; serials are plain [A-Z0-9] words, so nothing needs quoting
+    return "{" + ",".join(serials.split()) + "}"
+
+def load_serial_prices(cursor, df):
+    # Load a prepared frame carrying serial_numbers into device_serial_prices; returns (rows, elapsed)
+    start = time.perf_counter()
+    ensure_schema(cursor, SERIAL_DDL)
+    rows = df[SERIAL_PRICE_COLUMNS].assign(
+        serial_numbers=df["serial_numbers"].astype(object).map(serial_array),
+        fetched_at=df["fetched_at"],
+    )
+    copy_frame(cursor, rows, "device_serial_prices")
+    return len(rows), time.perf_counter() - start
+
+# Dictionary-encoded load: low-cardinality columns live once in dim_<column> tables and
+# device_facts stores their integer codes. device_facts_decoded joins the strings back.
+DIMENSIONS = [
+    "box_status", "category", "make", "model", "grade", "lock_status", "active_status", "carrier"
+]
+FACT_COLUMNS = (
+    [f"{dim}_id" for dim in DIMENSIONS] + ["storage", "color", "price", "serial_number", "fetched_at"]
+)
+
+ENCODED_DDL = "".join(
+    f"CREATE TABLE IF NOT EXISTS dim_{dim} (id serial PRIMARY KEY, value text NOT NULL UNIQUE);\n"
+    for dim in DIMENSIONS
+) + f"""
+CREATE TABLE IF NOT EXISTS device_facts (
+    {(","+chr(10)+"    ").join(f"{dim}_id integer REFERENCES dim_{dim} (id)" for dim in DIMENSIONS)},
+    storage text,
+    color text,
+    price numeric,
+    serial_number text,
+    fetched_at date
+);
+CREATE INDEX IF NOT EXISTS device_facts_lookup ON device_facts (make_id, model_id, fetched_at);
+CREATE OR REPLACE VIEW device_facts_decoded AS
+SELECT box_status.value AS box_status, category.value AS category, make.value AS make,
+       model.value AS model, f.storage, f.color, grade.value AS grade, lock_status.value AS lock_status,
+       active_status.value AS active_status, carrier.value AS carrier, f.price, f.serial_number, f.fetched_at
+FROM device_facts f
+{chr(10).join(f"LEFT JOIN dim_{dim} {dim} ON {dim}.id = f.{dim}_id" for dim in DIMENSIONS)};
+"""
+
+# Dimension -> {value: code}; each table is read once per process, then only unseen values hit the database
+DIMENSION_CODES = {}
+
+def dimension_codes(cursor, dim, values):
+    # Codes for every value, creating the missing ones; returns the dimension's cached mapping
+    if dim not in DIMENSION_CODES:
+        cursor.execute(f"SELECT value, id FROM dim_{dim}")
+        DIMENSION_CODES[dim] = dict(cursor.fetchall())
+    codes = DIMENSION_CODES[dim]
+
+    missing = [value for value in values if value not in codes]
+    if missing:
+        cursor.execute(
+            f"INSERT INTO dim_{dim} (value) SELECT unnest(%s::text[]) ON CONFLICT (value) DO NOTHING",
+            (missing,),
+        )
+        cursor.execute(f"SELECT value, id FROM dim_{dim} WHERE value = ANY(%s)", (missing,))
+        codes.update(cursor.fetchall())
+    return codes
+
+def encode_frame(cursor, df):
+    # Prepared frame -> device_facts columns, NULLs staying NULL codes
+    facts = {}
+    for dim in DIMENSIONS:
+        values = df[dim].astype(object)
+        codes = dimension_codes(cursor, dim, values.dropna().unique().tolist())
+        facts[f"{dim}_id"] = pd.array(values.map(codes), dtype="Int64")
+    for col in FACT_COLUMNS[len(DIMENSIONS):]:
+        facts[col] = df[col].to_numpy()
+    return pd.DataFrame(facts, columns=FACT_COLUMNS)
+
+def load_encoded(cursor, df):
+    # Encode a prepared frame and load it into device_facts; returns the elapsed seconds
+    start = time.perf_counter()
+    ensure_schema(cursor, ENCODED_DDL)
+    copy_frame(cursor, encode_frame(cursor, df), "device_facts")
+    return time.perf_counter() - start
+
+def prepare_concurrent_load(cursor, frames, load_mode):
+    # Create the load mode's tables and every dimension code up front, so loads running
+    # concurrently on other connections only write rows
+    frames = list(frames)
+    if any("serial_numbers" in df.columns for df in frames):
+        ensure_schema(cursor, SERIAL_DDL)
+
+    if load_mode == "delta":
+        ensure_schema(cursor, DELTA_DDL)
+    elif load_mode == "wide":
+        ensure_schema(cursor, WIDE_DDL)
+    elif load_mode == "encoded":
+        ensure_schema(cursor, ENCODED_DDL)
+        for dim in DIMENSIONS:
+            values = pd.concat([df[dim].astype(object) for df in frames]) if frames else pd.Series(dtype=object)
+            dimension_codes(cursor, dim, values.dropna().unique().tolist())
@@ -1,39 +1,44 @@
-import pandas as pd
-import re
+import numpy as np
 import os
-from pathlib import Path
 
-def main():
-    # Check if input file exists
-    input_file = "sections/macbook.xlsx"
-    if not os.path.exists(input_file):
-        print(f"❌ Input file not found: {input_file}")
-        return
-
-    # Load the MacBook Excel file
-    df = pd.read_excel(input_file, header=None)
-
-    def clean_price(val):
-        match = re.search(r"-?\d+(?:\.\d+)?", str(val))
-        return float(match.group(0)) if match else None
-
-    def extract_serials(text):
-        return re.findall(r"\b[A-Z0-9]{5,}\b", text)
-
-    records = []
+from scripts import artifacts
+from scripts import parsing
+from scripts import records
+
+SECTION = "macbook"
+OUTPUT_FILE = "processed/macbook_Final"
+COLUMNS = [
+    "box_status", "category", "make", "model", "storage", "color",
+    "grade", "lock_status", "active_status", "carrier", "serial_number", "price"
+]
+# "explode": five rows per serial; "array": five rows per price line, with all of the line's
+# serials space-separated in serial_numbers (loaded into device_serial_prices)
+SERIAL_MODE = os.environ.get("SERIAL_MODE", "explode")
+SERIAL_MODES = ["explode", "array"]
+ARRAY_COLUMNS = COLUMNS[:-2] + ["serial_numbers", "price"]
+
+def process(df, serial_mode=SERIAL_MODE):
+    if serial_mode not in SERIAL_MODES:
+        raise ValueError(f"❌ Unknown serial mode: {serial_mode} (expected one of {SERIAL_MODES})")
+
+    builder = records.RecordBuilder(ARRAY_COLUMNS if serial_mode == "array" else COLUMNS)
     current_model_header = ""
 
+    # Parse columns 2-6 and find styled rows for the whole section up front
+    names = parsing.as_str(df[0].where(df[0].notna(), ""))
+    styled = parsing.styled_rows(df)
+    price_matrix = parsing.price_matrix(df[[1, 2, 3, 4, 5]])
+
     # Loop through each row in the DataFrame
-    for _, row in df.iterrows():
-        first_col = str(row[0]) if pd.notna(row[0]) else ""
+    for first_col, is_styled, row_prices in zip(names, styled, price_matrix):
 
         # Update current model header
-        if "macbook" in first_col.lower() and not re.search(r"\b[A-Z0-9]{5,}\b", first_col):
+        if "macbook" in first_col.lower() and not parsing.SERIAL.search(first_col):
             current_model_header = first_col.strip()
             continue
 
         # Skip non-data rows
-        if any("228, 228, 228" in str(cell) or "224, 233, 243" in str(cell) for cell in row):
+        if is_styled:
             continue
         if "-" not in first_col:
             continue
@@ -44,19 +49,16 @@ def main():
         except ValueError:
             continue
         storage = storage_part.upper()
-        serials = extract_serials(serial_part)
+        serials = parsing.extract_serials(serial_part)
         if not serials:
             continue
 
         # Try 2nd to 5th columns, else 3rd to 6th
-        possible_price_sets = [
-            [row[1], row[2], row[3], row[4]],
-            [row[2], row[3], row[4], row[5]]
-        ]
+        possible_price_sets = [row_prices[0:4], row_prices[1:5]]
         prices = None
         for price_set in possible_price_sets:
-            if all(clean_price(p) is not None for p in price_set):
-                prices = [clean_price(p) for p in price_set]
+            if not np.isnan(price_set).any():
+                prices = list(price_set)
                 break
 
         if not prices:
@@ -67,94 +69,43 @@ def main():
         grades = ["", "", "A", "B", "mdm"]
         active_statuses = ["not active", "active", "active", "active", "active"]
 
+        # Five rows per serial; grade B is priced like grade A
+        row_prices = [prices[0], prices[1], prices[2], prices[2], prices[3]]
+        if serial_mode == "array":
+            builder.add(
+                5,
+                box_status=box_statuses, category="laptops", make="Apple", model=model,
+                storage=storage, color="", grade=grades, lock_status="",
+                active_status=active_statuses, carrier="", serial_numbers=" ".join(serials), price=row_prices,
+            )
+            continue
+
         for serial in serials:
-            records.append({
-                "box_status": "Sealed",
-                "category": "laptops",
-                "make": "Apple",
-                "model": model,
-                "storage": storage,
-                "color": "",
-                "grade": "",
-                "lock_status": "",
-                "active_status": "not active",
-                "carrier": "",
-                "serial_number": serial,
-                "price": prices[0]
-            })
-            records.append({
-                "box_status": "Unsealed",
-                "category": "laptops",
-                "make": "Apple",
-                "model": model,
-                "storage": storage,
-                "color": "",
-                "grade": "",
-                "lock_status": "",
-                "active_status": "active",
-                "carrier": "",
-                "serial_number": serial,
-                "price": prices[1]
-            })
-            records.append({
-                "box_status": "Unsealed",
-                "category": "laptops",
-                "make": "Apple",
-                "model": model,
-                "storage": storage,
-                "color": "",
-                "grade": "A",
-                "lock_status": "",
-                "active_status": "active",
-                "carrier": "",
-                "serial_number": serial,
-                "price": prices[2]
-            })
-            records.append({
-                "box_status": "Unsealed",
-                "category": "laptops",
-                "make": "Apple",
-                "model": model,
-                "storage": storage,
-                "color": "",
-                "grade": "B",
-                "lock_status": "",
-                "active_status": "active",
-                "carrier": "",
-                "serial_number": serial,
-                "price": prices[2]  # Same as A
-            })
-            records.append({
-                "box_status": "Unsealed",
-                "category": "laptops",
-                "make": "Apple",
-                "model": model,
-                "storage": storage,
-                "color": "",
-                "grade": "mdm",
-                "lock_status": "",
-                "active_status": "active",
-                "carrier": "",
-                "serial_number": serial,
-                "price": prices[3]
-            })
-
-    # Create output directory
-    output_dir = "processed"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Create DataFrame and reorder columns
-    final_df = pd.DataFrame(records)
-    final_df = final_df[[ 
-        "box_status", "category", "make", "model", "storage", "color",
-        "grade", "lock_status", "active_status", "carrier", "serial_number", "price"
-    ]]
-
-    # Save to Excel
-    output_path = "processed/macbook_Final.xlsx"
-    final_df.to_excel(output_path, index=False)
-
-    print("✅ Saved to processed/macbook_Final.xlsx")
+            builder.add(
+                5,
+                box_status=box_statuses, category="laptops", make="Apple", model=model,
+                storage=storage, color="", grade=grades, lock_status="",
+                active_status=active_statuses, carrier="", serial_number=serial, price=row_prices,
+            )
+
+    return builder.build()
+
+def save(final_df, output_file=OUTPUT_FILE):
+    # Save output (creates the directory if needed)
+    path = artifacts.save_frame(final_df, output_file)
+    print(f"✅ Saved to {path}")
+
+def main():
+    # Check if input file exists
+    input_file = "sections/macbook"
+    if artifacts.find_artifact(input_file)[0] is None:
+        print(f"❌ Input file not found: {input_file}")
+        return
+
+    # Load the MacBook Excel file
+    df = artifacts.load_frame(input_file, header=False)
+
+    save(process(df))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Instrumentation is off unless a report destination is configured
+METRICS_FILE = os.environ.get("PIPELINE_METRICS")  # JSON run report
+PROMETHEUS_FILE = os.environ.get("PIPELINE_METRICS_PROM")  # Prometheus text exposition
+enabled = bool(METRICS_FILE or PROMETHEUS_FILE)
+
+FIELDS = ["wall_s", "cpu_s", "rows_in", "rows_out", "bytes_read", "bytes_written"]
+
+_stages = []
+_local = threading.local()
+_lock = threading.Lock()
+_started_at = datetime.now(timezone.utc)
+
+def new_record(name, rows_in=None):
+    return {"stage": name, "wall_s": 0.0, "cpu_s": 0.0, "rows_in": rows_in,
+            "rows_out": None, "bytes_read": 0, "bytes_written": 0}
+
+def record(entry):
+    with _lock:
+        _stages.append(entry)
+
+@contextmanager
+def stage(name, rows_in=None):
+    # Times the block; the yielded dict takes rows_out (and anything else) from the caller.
+    # CPU time is this thread's own, so stages running side by side on other threads (sink
+    # writes, concurrent uploads) aren't charged for each other's work.
+    entry = new_record(name, rows_in)
+    if not enabled:
+        yield entry
+        return
+
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(entry)
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield entry
+    finally:
+        entry["wall_s"] = time.perf_counter() - wall
+        entry["cpu_s"] = time.thread_time() - cpu
+        stack.pop()
+        record(entry)
+
+def count_bytes(read=0, written=0):
+    # Attribute I/O to the innermost running stage on this thread
+    if not enabled:
+        return
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1]["bytes_read"] += read
+        stack[-1]["bytes_written"] += written
+
+def timed_call(func, *args):
+    # Runs in a worker process: returns the result with that process's own timings
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    result = func(*args)
+    return result, time.perf_counter() - wall, time.process_time() - cpu
+
+def report():
+    return {
+        "started_at": _started_at.isoformat(),
+        "stages": list(_stages),
+    }
+
+def totals():
+    # One entry per stage name: stages that ran more than once (an upload per chunk or per
+    # backfilled list) are summed, with the number of runs in "runs"
+    merged = {}
+    for entry in list(_stages):
+        total = merged.setdefault(entry["stage"], {"runs": 0, **dict.fromkeys(FIELDS)})
+        total["runs"] += 1
+        for field in FIELDS:
+            if entry[field] is not None:
+                total[field] = (total[field] or 0) + entry[field]
+    return merged
+
+def prometheus_text():
+    # Series have to be unique per label set, so repeated stages are exported as their totals
+    merged = totals()
+    lines = ["# TYPE pipeline_stage_runs gauge"]
+    lines += [f'pipeline_stage_runs{{stage="{stage}"}} {total["runs"]}' for stage, total in merged.items()]
+    for field in FIELDS:
+        metric = "pipeline_stage_" + (field[:-2] + "_seconds" if field.endswith("_s") else field)
+        lines.append(f"# TYPE {metric} gauge")
+        for stage, total in merged.items():
+            if total[field] is not None:
+                lines.append(f'{metric}{{stage="{stage}"}} {total[field]}')
+    return "\n".join(lines) + "\n"
+
+def write_reports():
+    if not enabled:
+        return
+    if METRICS_FILE:
+        with open(METRICS_FILE, "w") as f:
+            json.dump(report(), f, indent=2)
+        print(f"📊 Run report written to {METRICS_FILE}")
+    if PROMETHEUS_FILE:
+        with open(PROMETHEUS_FILE, "w") as f:
+            f.write(prometheus_text())
+        print(f"📊 Prometheus metrics written to {PROMETHEUS_FILE}")
@@ -0,0 +1,169 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Model names repeat across sections and days, so parsed names are memoized on the raw string
+MEMO_SIZE = 8192
+
+# Precompiled patterns shared by the device processors
+PRICE_NUMBER = re.compile(r"(-?\d+(?:\.\d+)?)")  # "$1,299" -> 1
+DOLLAR_PRICE = re.compile(r"\$(-?\d+)")
+DOLLAR_AMOUNT = re.compile(r"\$\d+")  # new iPhone prices are "$123" strings
+AMOUNT = re.compile(r"\$?\d+")  # used iPhone prices may drop the "$"
+INTEGER = re.compile(r"(-?\d+)")
+NOT_PRICE_CHARS = re.compile(r"[^\d.]")
+STYLED_ROW = re.compile(r"228, 228, 228|224, 233, 243")  # gray header rows carry their colour
+STORAGE = re.compile(r"\b\d+(?:GB|TB)\b", re.IGNORECASE)
+STORAGE_ANYWHERE = re.compile(r"\d+GB|\d+TB", re.IGNORECASE)
+SERIAL = re.compile(r"\b[A-Z0-9]{5,}\b")
+IPHONE = re.compile(r"iPhone", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+KNOWN_COLORS = ["Red", "Desert", "Black", "White", "Gold", "Silver", "Blue", "Green", "Purple", "Yellow"]
+KNOWN_CARRIERS = ["Verizon", "Xfinity", "Sprint", "T-Mobile", "AT&T"]
+
+# One alternation for every token a phone name can carry; only storage and lock words are cut from the model
+TOKEN = re.compile(
+    r"(?P<storage>\b\d+(?:GB|TB)\b)"
+    r"|(?P<lock>\b(?:Unlocked|Locked)\b)"
+    r"|(?P<color>\b(?:" + "|".join(KNOWN_COLORS) + r")\b)"
+    r"|(?P<carrier>(?-i:" + "|".join(re.escape(carrier) for carrier in KNOWN_CARRIERS) + r"))",
+    re.IGNORECASE,
+)
+# iPhone list names: storage (case-sensitive) and colour words, "Others" included, are cut from the model
+IPHONE_NOISE = re.compile(
+    r"(?-i:\b(?:\d+GB|\d+TB)\b)|\b(?:" + "|".join(KNOWN_COLORS + ["Others"]) + r")\b", re.IGNORECASE
+)
+
+Tokens = namedtuple("Tokens", ["storage", "color", "lock_status", "carriers", "model"])
+
+def as_str(col):
+    # str() of every cell like the row loops did (NaN -> "nan"); newer pandas keeps NaN on astype(str)
+    return pd.Series(col.to_numpy(dtype=object).astype(str), index=col.index, dtype=object)
+
+def cells_as_str(block):
+    # Every cell of a block as str(), flattened row by row
+    return pd.Series(block.to_numpy(dtype=object).astype(str).ravel(), dtype=object)
+
+def price_matrix(block, pattern=PRICE_NUMBER):
+    # Price columns -> float matrix in one pass: first match of the pattern per cell, NaN when none
+    found = cells_as_str(block).str.extract(pattern, expand=False)
+    return pd.to_numeric(found).to_numpy(dtype=float).reshape(block.shape)
+
+def digit_matrix(block):
+    # Price columns -> float matrix keeping only digits and dots ("$1,200" -> 1200); blanks are 0
+    digits = cells_as_str(block).str.replace(NOT_PRICE_CHARS, "", regex=True)
+    return pd.to_numeric(digits.where(digits != "", "0")).to_numpy(dtype=float).reshape(block.shape)
+
+def styled_rows(df):
+    # Rows where any cell carries a header background colour
+    styled = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        styled |= as_str(df[col]).str.contains(STYLED_ROW).to_numpy()
+    return styled
+
+def lock_status(text):
+    lower = text.lower()
+    if "unlocked" in lower:
+        return "Unlocked"
+    elif "locked" in lower:
+        return "Locked"
+    return None
+
+def cut(text, spans):
+    # Text with the given (start, end) spans removed
+    pieces = []
+    last = 0
+    for start, end in spans:
+        pieces.append(text[last:start])
+        last = end
+    pieces.append(text[last:])
+    return "".join(pieces)
+
+@lru_cache(maxsize=MEMO_SIZE)
+def tokenize(text):
+    # Single scan of a phone name: storage, colour, lock words and carriers; the model is what's
+    # left once storage and lock words are cut out
+    storage = None
+    color = None
+    carriers = []
+    spans = []
+    for match in TOKEN.finditer(text):
+        kind = match.lastgroup
+        if kind == "storage":
+            storage = storage or match.group().upper()
+            spans.append(match.span())
+        elif kind == "lock":
+            spans.append(match.span())
+        elif kind == "color":
+            color = color or match.group().capitalize()
+        else:
+            carriers.append(match.group())
+
+    model = " ".join(cut(text, spans).strip().split())
+    return Tokens(storage, color, lock_status(text), tuple(carriers), model)
+
+@lru_cache(maxsize=MEMO_SIZE)
+def tokenize_iphone(text):
+    # New iPhone list names ("iPhone 16 Pro 256GB Desert"): storage may sit anywhere, the colour
+    # is the first known one mentioned, else "Other"
+    match = STORAGE_ANYWHERE.search(text)
+    storage = match.group().upper() if match else None
+
+    lower = text.lower()
+    color = next((known for known in KNOWN_COLORS if known.lower() in lower), "Other")
+
+    model = IPHONE_NOISE.sub("", IPHONE.sub("", text))
+    model = WHITESPACE.sub(" ", model).strip()
+    return Tokens(storage, color, lock_status(text), (), model)
+
+@lru_cache(maxsize=MEMO_SIZE)
+def tokenize_samsung(text):
+    # Word scan of Samsung names: the last GB/TB word is the storage, locked unless a word says
+    # "unlocked", and carriers are pulled out of the words that contain them ("VerizonT-Mobile")
+    storage = ""
+    status = "Locked"
+    carriers = []
+    model_parts = []
+
+    for part in text.split():
+        low = part.lower()
+        if "gb" in low or "tb" in low:
+            storage = part.upper()
+        elif low == "unlocked":
+            status = "Unlocked"
+        elif part in KNOWN_CARRIERS:
+            carriers.append(part)
+        elif any(carrier in part for carrier in KNOWN_CARRIERS):
+            for carrier in KNOWN_CARRIERS:
+                if carrier in part:
+                    carriers.append(carrier)
+                    part = part.replace(carrier, "")
+        else:
+            model_parts.append(part)
+
+    return Tokens(storage, None, status, tuple(carriers) or ("",), " ".join(model_parts).strip())
+
+@lru_cache(maxsize=MEMO_SIZE)
+def tokenize_ipad(text):
+    # Word scan of iPad names: only Verizon cellular models carry a carrier
+    storage = ""
+    carrier = ""
+    model_parts = []
+
+    for part in text.split():
+        if "gb" in part.lower() or "tb" in part.lower():
+            storage = part.upper()
+        elif part.lower() == "verizon":
+            carrier = "Verizon"
+        else:
+            model_parts.append(part)
+
+    model = " ".join(model_parts).replace("Verizon", "").strip()
+    return Tokens(storage, None, None, (carrier,), model)
+
+def extract_serials(text):
+    return SERIAL.findall(text)
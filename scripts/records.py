@@ -0,0 +1,89 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from scripts import artifacts
+
+# Low-cardinality output fields, stored as categorical codes (matched on the normalized column name)
+CATEGORICAL = {
+    "box_status", "category", "make", "storage", "color", "grade",
+    "lock_status", "active_status", "carrier"
+}
+NUMERIC = {"price"}
+
+def is_categorical(col):
+    return artifacts.column_key(col) in CATEGORICAL
+
+def categorical(values):
+    # Object array -> Categorical; None/NaN stay missing, "" is its own category
+    return pd.Categorical(values)
+
+def to_frame(arrays, columns):
+    # Assemble finished column arrays without copying them; categorical fields get encoded
+    data = {}
+    for col in columns:
+        values = arrays[col]
+        if is_categorical(col) and not isinstance(values, pd.Categorical):
+            values = categorical(values)
+        data[col] = values
+    return pd.DataFrame(data, columns=columns, copy=False)
+
+class RecordBuilder:
+    # Append-only columnar buffer for processor output rows.
+    # add() takes one batch of rows: each field is a scalar shared by the batch or a sequence with
+    # one value per row. Categorical fields keep int32 codes, prices a float64 array, the rest lists.
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.size = 0
+        self._codes = {}
+        self._categories = {}
+        self._values = {}
+        for col in self.columns:
+            if is_categorical(col):
+                self._codes[col] = array("i")
+                self._categories[col] = {}
+            elif artifacts.column_key(col) in NUMERIC:
+                self._values[col] = array("d")
+            else:
+                self._values[col] = []
+
+    def _code(self, col, value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return -1
+        categories = self._categories[col]
+        code = categories.get(value)
+        if code is None:
+            code = categories[value] = len(categories)
+        return code
+
+    def add(self, count=1, **fields):
+        for col in self.columns:
+            value = fields.get(col)
+            many = isinstance(value, (list, tuple, np.ndarray))
+            if col in self._codes:
+                if many:
+                    self._codes[col].extend(self._code(col, item) for item in value)
+                else:
+                    self._codes[col].extend([self._code(col, value)] * count)
+            elif many:
+                self._values[col].extend(value)
+            else:
+                self._values[col].extend([value] * count)
+        self.size += count
+
+    def __len__(self):
+        return self.size
+
+    def build(self):
+        arrays = {}
+        for col in self.columns:
+            if col in self._codes:
+                codes = np.frombuffer(self._codes[col], dtype=np.int32) if self.size else np.empty(0, np.int32)
+                arrays[col] = pd.Categorical.from_codes(codes, categories=list(self._categories[col]))
+            elif isinstance(self._values[col], array):
+                arrays[col] = np.frombuffer(self._values[col], dtype=np.float64) if self.size else np.empty(0)
+            else:
+                arrays[col] = np.array(self._values[col], dtype=object)
+        return to_frame(arrays, self.columns)
@@ -1,24 +1,18 @@
-import pandas as pd
-import re
-import os
+import numpy as np
 
-def main():
-    # Check if input file exists
-    input_file = "sections/samsung_phones.xlsx"
-    if not os.path.exists(input_file):
-        print(f"❌ Input file not found: {input_file}")
-        return
-
-    # Load file
-    df = pd.read_excel(input_file, header=None)
+from scripts import artifacts
+from scripts import parsing
+from scripts import records
 
-    # Helper to extract numeric price
-    def clean_price(val):
-        match = re.search(r"-?\d+(?:\.\d+)?", str(val))
-        return float(match.group(0)) if match else None
+SECTION = "samsung phones"
+OUTPUT_FILE = "processed/samsung_Final"
+COLUMNS = [
+    "box_status", "category", "make", "model", "storage", "color",
+    "grade", "lock_status", "active_status", "carrier", "price"
+]
 
+def process(df):
     # Constants
-    known_carriers = ["Verizon", "Xfinity", "Sprint", "T-Mobile", "AT&T"]
     grade_slots = [
         (0, [""]),          # Sealed (no grade)
         (1, ["A+"]),
@@ -28,87 +22,65 @@ def main():
         (5, ["E"]),
     ]
 
-    records = []
+    builder = records.RecordBuilder(COLUMNS)
 
-    # Loop over each row in the Excel file
-    for _, row in df.iterrows():
-        first_col = str(row[0]).strip()
+    # Parse the six price columns and find styled rows for the whole section up front
+    names = parsing.as_str(df[0]).str.strip()
+    styled = parsing.styled_rows(df)
+    price_matrix = parsing.price_matrix(df[list(range(1, 7))])
 
+    # Loop over each row in the Excel file
+    for first_col, is_styled, price_values in zip(names, styled, price_matrix):
         # Skip empty rows
         if not first_col or first_col.isnumeric():
             continue
 
         # Skip styled header rows (gray)
-        if any("228, 228, 228" in str(cell) or "224, 233, 243" in str(cell) for cell in row):
+        if is_styled:
             continue
 
-        parts = first_col.split()
+        # Storage, lock status (Locked by default), carriers and model in one word scan
         make = "Samsung"
-        storage = ""
-        lock_status = "Locked"  # Default to Locked
-        carriers = []
-        model_parts = []
-
-        for part in parts:
-            low = part.lower()
-            if "gb" in low or "tb" in low:
-                storage = part.upper()
-            elif low == "unlocked":
-                lock_status = "Unlocked"
-            elif part in known_carriers:
-                carriers.append(part)
-            elif any(car in part for car in known_carriers):
-                for car in known_carriers:
-                    if car in part:
-                        carriers.append(car)
-                        part = part.replace(car, "")
-            else:
-                model_parts.append(part)
-
-        if not carriers:
-            carriers = [""]
-
-        model = " ".join(model_parts).strip()
-        price_values = [clean_price(row[i]) for i in range(1, 7)]
-
-        for i, grades in grade_slots:
-            if i >= len(price_values):
-                continue
+        storage, _, lock_status, carriers, model = parsing.tokenize_samsung(first_col)
+
+        # Every priced grade slot fans out over the row's carriers and the slot's grades
+        grades, row_carriers, prices = [], [], []
+        for i, slot_grades in grade_slots:
             price = price_values[i]
-            if price is None:
+            if np.isnan(price):
                 continue
 
             for carrier in carriers:
-                for grade in grades:
-                    record = {
-                        "box_status": "Sealed" if grade == "" else "Unsealed",
-                        "category": "cellphones",
-                        "make": make,
-                        "model": model,
-                        "storage": storage,
-                        "color": "",
-                        "grade": grade,
-                        "lock_status": lock_status,
-                        "active_status": "",
-                        "carrier": carrier,
-                        "price": price
-                    }
-                    records.append(record)
-
-    # Create output directory
-    output_dir = "processed"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Define final column order
-    final_df = pd.DataFrame(records)
-    final_df = final_df[[
-        "box_status", "category", "make", "model", "storage", "color",
-        "grade", "lock_status", "active_status", "carrier", "price"
-    ]]
-
-    # Save output
-    final_df.to_excel("processed/samsung_Final.xlsx", index=False)
-    print(f"✅ Saved {len(final_df)} records to processed/samsung_Final.xlsx")
+                for grade in slot_grades:
+                    grades.append(grade)
+                    row_carriers.append(carrier)
+                    prices.append(price)
+
+        builder.add(
+            len(grades),
+            box_status=["Sealed" if grade == "" else "Unsealed" for grade in grades],
+            category="cellphones", make=make, model=model, storage=storage, color="",
+            grade=grades, lock_status=lock_status, active_status="", carrier=row_carriers, price=prices,
+        )
+
+    return builder.build()
+
+def save(final_df, output_file=OUTPUT_FILE):
+    # Save output (creates the directory if needed)
+    path = artifacts.save_frame(final_df, output_file)
+    print(f"✅ Saved {len(final_df)} records to {path}")
+
+def main():
+    # Check if input file exists
+    input_file = "sections/samsung_phones"
+    if artifacts.find_artifact(input_file)[0] is None:
+        print(f"❌ Input file not found: {input_file}")
+        return
+
+    # Load file
+    df = artifacts.load_frame(input_file, header=False)
+
+    save(process(df))
 
 if __name__ == "__main__":
     main()
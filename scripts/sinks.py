@@ -0,0 +1,129 @@
+import itertools
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from scripts import loader
+from scripts import metrics
+from scripts.artifacts import EXPECTED_COLUMNS
+
+# Local and analytics outputs next to PostgreSQL. Every writer in WRITERS takes the prepared frames
+# of a run (EXPECTED_COLUMNS plus fetched_at, and serial_numbers for MacBook frames in
+# SERIAL_MODE=array) keyed by processed file name, and the run itself (fetched_at, the frames'
+# upload keys, page hash and extractor cache, which only PostgreSQL's checkpoints need). They
+# return the names they wrote, or None when nothing was kept.
+SINKS = ["postgres", "sqlite", "parquet"]
+SQLITE_DATABASE = os.environ.get("SQLITE_DATABASE", "hanggroup.sqlite")
+PARQUET_DATASET = os.environ.get("PARQUET_DATASET", "dataset")
+SQLITE_BATCH_ROWS = 5000
+
+COLUMNS = EXPECTED_COLUMNS + ["fetched_at", "serial_numbers"]
+
+SQLITE_DDL = """
+CREATE TABLE IF NOT EXISTS devices (
+    box_status TEXT, category TEXT, make TEXT, model TEXT, storage TEXT, color TEXT,
+    grade TEXT, lock_status TEXT, active_status TEXT, carrier TEXT, price REAL,
+    serial_number TEXT, fetched_at TEXT, serial_numbers TEXT
+);
+CREATE INDEX IF NOT EXISTS devices_fetched_at_category ON devices (fetched_at, category);
+"""
+
+# Hive-style directories, e.g. dataset/fetched_at=2024-10-18/category=Cellphone/source_file=macbook_Final/.
+# Every processed file has partitions of its own, so rewriting one never touches another's rows.
+PARTITIONING = ["fetched_at", "category", "source_file"]
+PARQUET_SCHEMA = pa.schema(
+    [(col, pa.float64() if col == "price" else pa.string()) for col in EXPECTED_COLUMNS]
+    + [("fetched_at", pa.date32()), ("serial_numbers", pa.string()), ("source_file", pa.string())]
+)
+
+def plain_values(df):
+    # Every sink column as plain Python objects, with None for missing values and absent columns
+    df = df.reindex(columns=COLUMNS).astype(object)
+    return df.where(df.notna(), None)
+
+def report(sink, name, rows, elapsed):
+    rate = loader.rows_per_second(rows, elapsed)
+    print(f"✅ {sink}: wrote {rows} rows from {Path(name).name} in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+
+def insert_sqlite(conn, df):
+    values = plain_values(df)
+    values["fetched_at"] = values["fetched_at"].map(lambda day: None if day is None else day.isoformat())
+    rows = values.itertuples(index=False, name=None)
+    sql = f"INSERT INTO devices ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+    while True:
+        batch = list(itertools.islice(rows, SQLITE_BATCH_ROWS))
+        if not batch:
+            break
+        conn.executemany(sql, batch)
+
+def write_sqlite(frames, run=None, path=SQLITE_DATABASE):
+    # Append to the devices table of a local SQLite database in one transaction, each frame under
+    # its own savepoint. WAL mode lets readers query the file while a run writes to it.
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SQLITE_DDL)
+
+        written = []
+        conn.execute("BEGIN")
+        for name, df in frames.items():
+            with metrics.stage(f"sqlite:{Path(name).name}", rows_in=len(df)) as stats:
+                start = time.perf_counter()
+                conn.execute("SAVEPOINT frame")
+                try:
+                    insert_sqlite(conn, df)
+                    conn.execute("RELEASE SAVEPOINT frame")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO SAVEPOINT frame")
+                    conn.execute("RELEASE SAVEPOINT frame")
+                    print(f"❌ SQLite: error writing {name}: {e}")
+                    continue
+                stats["rows_out"] = len(df)
+            report("SQLite", name, len(df), time.perf_counter() - start)
+            written.append(name)
+        conn.execute("COMMIT")
+        return written
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"❌ SQLite write to {path} failed, transaction rolled back: {e}")
+        return None
+    finally:
+        conn.close()
+
+def write_parquet(frames, run=None, root=PARQUET_DATASET):
+    # Write every frame into a dataset partitioned by fetched_at, category and processed file. The
+    # partitions a frame writes to are emptied first, so writing a file again for the same date
+    # replaces its rows instead of leaving old part files next to the new ones.
+    written = []
+    for name, df in frames.items():
+        try:
+            with metrics.stage(f"parquet:{Path(name).name}", rows_in=len(df)) as stats:
+                start = time.perf_counter()
+                values = plain_values(df).assign(source_file=Path(name).name)
+                table = pa.Table.from_pandas(values, schema=PARQUET_SCHEMA, preserve_index=False)
+                ds.write_dataset(
+                    table, root, format="parquet",
+                    partitioning=PARTITIONING, partitioning_flavor="hive",
+                    basename_template="part-{i}.parquet",
+                    existing_data_behavior="delete_matching",
+                )
+                stats["rows_out"] = len(df)
+        except Exception as e:
+            print(f"❌ Parquet: error writing {name}: {e}")
+            continue
+        report("Parquet", name, len(df), time.perf_counter() - start)
+        written.append(name)
+    return written
+
+def read_parquet(root=PARQUET_DATASET):
+    # The whole dataset as one frame, partition columns (source_file too) included
+    return ds.dataset(root, schema=PARQUET_SCHEMA, format="parquet", partitioning="hive").to_table().to_pandas()
+
+# run_pipeline adds the "postgres" writer
+WRITERS = {"sqlite": write_sqlite, "parquet": write_parquet}
@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+
+# Every fetched price list page is kept once, gzipped and keyed by the sha256 of its bytes, so a
+# run can be replayed offline later. index.jsonl records which URL and fetched_at each page had.
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")  # "" turns snapshots off
+INDEX_FILE = "index.jsonl"
+
+def object_path(digest, root=SNAPSHOT_DIR):
+    return os.path.join(root, "objects", digest[:2], digest[2:] + ".html.gz")
+
+def load_index(root=SNAPSHOT_DIR):
+    path = os.path.join(root, INDEX_FILE)
+    if not root or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save(content, url, fetched_at, root=SNAPSHOT_DIR):
+    # Store the page unless it's already there; returns its hash (None with snapshots off)
+    if not root:
+        return None
+
+    digest = hashlib.sha256(content).hexdigest()
+    path = object_path(digest, root)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    add_to_index(digest, url, fetched_at, root)
+    return digest
+
+def add_to_index(digest, url, fetched_at, root=SNAPSHOT_DIR):
+    entry = {"hash": digest, "url": url, "fetched_at": fetched_at.isoformat()}
+    if not any(all(seen.get(key) == value for key, value in entry.items()) for seen in load_index(root)):
+        entry["saved_at"] = datetime.now().isoformat(timespec="seconds")
+        with open(os.path.join(root, INDEX_FILE), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+    print(f"📸 Snapshot {digest[:12]} saved to {root}")
+
+class Writer:
+    # Streaming save(): the page is gzipped as its chunks are written, then filed under its hash
+    # by commit(), so it's never held whole. discard() drops a page that wasn't read to the end.
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self.sha256 = hashlib.sha256()
+        self.file = None
+        if root:
+            directory = os.path.join(root, "objects")
+            os.makedirs(directory, exist_ok=True)
+            self.tmp = os.path.join(directory, f"incoming-{os.getpid()}.html.gz.tmp")
+            self.file = gzip.open(self.tmp, "wb", compresslevel=6)
+
+    def write(self, chunk):
+        self.sha256.update(chunk)
+        if self.file is not None:
+            self.file.write(chunk)
+
+    def commit(self, url, fetched_at):
+        # Returns the page's hash (None with snapshots off)
+        if self.file is None:
+            return None
+        self.file.close()
+        self.file = None
+
+        digest = self.sha256.hexdigest()
+        path = object_path(digest, self.root)
+        if os.path.exists(path):
+            os.remove(self.tmp)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.tmp, path)
+        add_to_index(digest, url, fetched_at, self.root)
+        return digest
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.remove(self.tmp)
+
+def load(digest, root=SNAPSHOT_DIR):
+    # Page bytes of a snapshot, checked against its hash
+    with gzip.open(object_path(digest, root), "rb") as f:
+        content = f.read()
+    if hashlib.sha256(content).hexdigest() != digest:
+        raise ValueError(f"❌ Snapshot {digest[:12]} is corrupt")
+    return content
+
+def find(selectors, root=SNAPSHOT_DIR):
+    # Index entries matching any selector: a hash prefix or a fetched_at date (YYYY-MM-DD).
+    # No selectors, or "all", selects every entry. Entries come back in fetched_at order.
+    entries = load_index(root)
+    if selectors and "all" not in selectors:
+        entries = [
+            entry for entry in entries
+            if any(entry["hash"].startswith(selector) or entry["fetched_at"] == selector for selector in selectors)
+        ]
+    return sorted(entries, key=lambda entry: (entry["fetched_at"], entry["saved_at"]))
@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import types
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import datetime
+
+import pandas as pd
+
+from scripts import metrics
+
+# Stage results are cached under a key made of the stage name, the source of its code (and of every
+# scripts module that code imports), its config and the digests of its inputs. Values are pickled
+# once under objects/, named by their sha256, and keys/ maps each key to the digests it produced, so
+# a stage whose inputs, code and config are unchanged is skipped and its outputs reused.
+STAGE_CACHE = os.environ.get("STAGE_CACHE", ".cache/stages")  # "" turns stage caching off
+# Keys not looked up for this many days are pruned, with every object only they referred to
+STAGE_CACHE_DAYS = float(os.environ.get("STAGE_CACHE_DAYS", "30"))
+PACKAGE = __name__.split(".")[0]
+
+_code_digests = {}
+
+class Stage:
+    # One step of the graph: func(*inputs) returns its single output, or a tuple with one value per
+    # output when it declares several (None for an output it couldn't produce). rows_out in the run
+    # report counts the `counted` outputs, all of them by default.
+
+    def __init__(self, name, func, inputs, outputs, code=(), config=None, counted=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = list(code)
+        self.config = config or {}
+        self.counted = list(counted or outputs)
+
+    def key(self, digests):
+        return key(self.name, self.code, self.config, [digests[name] for name in self.inputs])
+
+class Results:
+    # Digests of every value a run produced or reused. Values stay in memory once computed; reused
+    # ones are read from the store the first time they're asked for.
+
+    def __init__(self, sources, root):
+        self.root = root
+        self.digests = {name: digest for name, (digest, _) in sources.items()}
+        self.loaders = {name: load_source for name, (_, load_source) in sources.items()}
+        self.values = {}
+        self.missing = set()
+        self.ran = []
+        self.cached = []
+        self.failed = []
+
+    def __contains__(self, name):
+        return name in self.digests
+
+    def get(self, name):
+        if name not in self.values:
+            if name in self.loaders:
+                self.values[name] = self.loaders[name]()
+            else:
+                self.values[name] = load(self.digests[name], self.root)
+        return self.values[name]
+
+    def add(self, name, value):
+        if value is None:
+            self.missing.add(name)
+            return None
+        self.values[name] = value
+        self.digests[name] = put(value, self.root)
+        return self.digests[name]
+
+def source(value):
+    # (digest, loader) for a graph input known up front; bytes are keyed by their own sha256
+    if isinstance(value, bytes):
+        digest = hashlib.sha256(value).hexdigest()
+    else:
+        digest = hashlib.sha256(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+    return digest, lambda: value
+
+def code_digest(modules):
+    # sha256 over the source files of the modules and every scripts module they import, transitively
+    files = {}
+    todo = list(modules)
+    while todo:
+        module = todo.pop()
+        if module.__name__ in files:
+            continue
+        if module.__name__ not in _code_digests:
+            with open(module.__file__, "rb") as f:
+                _code_digests[module.__name__] = hashlib.sha256(f.read()).hexdigest()
+        files[module.__name__] = _code_digests[module.__name__]
+
+        for value in vars(module).values():
+            name = value.__name__ if isinstance(value, types.ModuleType) else getattr(value, "__module__", None)
+            if isinstance(name, str) and name.split(".")[0] == PACKAGE and name in sys.modules:
+                todo.append(sys.modules[name])
+    return hashlib.sha256(json.dumps(files, sort_keys=True).encode("utf-8")).hexdigest()
+
+def key(name, code, config, digests):
+    # Pickles are only valid for the pandas that wrote them, so its version is part of every key
+    parts = {
+        "stage": name,
+        "code": code_digest(code),
+        "config": config,
+        "inputs": digests,
+        "python": list(sys.version_info[:2]),
+        "pandas": pd.__version__,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def object_path(digest, root=STAGE_CACHE):
+    return os.path.join(root, "objects", digest[:2], digest[2:] + ".pkl")
+
+def key_path(stage_key, root=STAGE_CACHE):
+    return os.path.join(root, "keys", stage_key[:2], stage_key[2:] + ".json")
+
+def write_atomic(path, data):
+    # Backfill workers may write the same object at once, so each writes its own temp file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def put(value, root=STAGE_CACHE):
+    # Store a value and return its digest (None with stage caching off)
+    if not root:
+        return None
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    digest = hashlib.sha256(data).hexdigest()
+    path = object_path(digest, root)
+    if not os.path.exists(path):
+        write_atomic(path, data)
+    return digest
+
+def load(digest, root=STAGE_CACHE):
+    with open(object_path(digest, root), "rb") as f:
+        return pickle.load(f)
+
+def lookup(stage_key, root=STAGE_CACHE):
+    # Output digests recorded for a key, or None when it never finished (or a value has gone)
+    if not root or not os.path.exists(key_path(stage_key, root)):
+        return None
+    with open(key_path(stage_key, root)) as f:
+        outputs = json.load(f)["outputs"]
+    if any(digest is not None and not os.path.exists(object_path(digest, root)) for digest in outputs.values()):
+        return None
+    os.utime(key_path(stage_key, root))  # last use, for prune()
+    return outputs
+
+def record(stage_key, name, outputs=None, root=STAGE_CACHE):
+    # Remember what a key produced; outputs may be empty for stages that only have side effects
+    if not root:
+        return
+    entry = {"stage": name, "outputs": outputs or {}, "finished_at": datetime.now().isoformat(timespec="seconds")}
+    write_atomic(key_path(stage_key, root), json.dumps(entry).encode("utf-8"))
+
+def cache_files(root, directory, suffix):
+    for parent, _, names in os.walk(os.path.join(root, directory)):
+        for name in names:
+            if name.endswith(suffix):
+                yield os.path.join(parent, name)
+
+def prune(days=STAGE_CACHE_DAYS, root=STAGE_CACHE):
+    # Drop keys that haven't been recorded or looked up for `days` days, then the objects no key
+    # refers to any more. Unreferenced objects newer than that are left alone, since a run going
+    # on at the same time may not have recorded their key yet. Returns (keys, objects) removed.
+    if not root or not os.path.isdir(root):
+        return 0, 0
+    cutoff = datetime.now().timestamp() - days * 86400
+
+    removed_keys, referenced = 0, set()
+    for path in cache_files(root, "keys", ".json"):
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed_keys += 1
+            continue
+        with open(path) as f:
+            referenced.update(digest for digest in json.load(f)["outputs"].values() if digest)
+
+    removed_objects = 0
+    for path in cache_files(root, "objects", ".pkl"):
+        digest = os.path.basename(os.path.dirname(path)) + os.path.basename(path)[:-len(".pkl")]
+        if digest not in referenced and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed_objects += 1
+
+    if removed_keys or removed_objects:
+        print(f"🧹 Pruned {removed_keys} stage key(s) and {removed_objects} cached value(s) unused for {days:g} days")
+    return removed_keys, removed_objects
+
+def rows(value):
+    return len(value) if hasattr(value, "__len__") and not isinstance(value, (bytes, str)) else None
+
+def run(graph, sources, pool=None, force=False, root=STAGE_CACHE):
+    # Run the stages in dependency order, starting from sources ({name: (digest, loader)}).
+    # Stages with a cached result are skipped unless force is set; when more than one stage is ready
+    # they go to the pool (an Executor) together. A stage that fails or lacks an input is reported
+    # and its dependents are skipped, the rest of the graph still runs.
+    results = Results(sources, root)
+    pending = list(graph)
+    running = {}
+
+    def finish(stage, stage_key, values):
+        if len(stage.outputs) == 1:
+            values = (values,)
+        outputs = {name: results.add(name, value) for name, value in zip(stage.outputs, values)}
+        record(stage_key, stage.name, outputs, root)
+        results.ran.append(stage.name)
+        return sum(rows(results.values[name]) or 0 for name in stage.counted if name in results.values)
+
+    def fail(stage, e):
+        print(f"❌ {stage.name} failed: {type(e).__name__}: {e}")
+        results.failed.append(stage.name)
+        results.missing.update(stage.outputs)
+
+    while pending or running:
+        ready = [stage for stage in pending
+                 if all(name in results or name in results.missing for name in stage.inputs)]
+        if not ready:
+            if not running:
+                names = sorted({name for stage in pending for name in stage.inputs} - set(results.digests))
+                raise ValueError(f"❌ No stage produces {', '.join(names)}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, stage_key, entry = running.pop(future)
+                try:
+                    values, entry["wall_s"], entry["cpu_s"] = future.result()
+                    entry["rows_out"] = finish(stage, stage_key, values)
+                except Exception as e:
+                    fail(stage, e)
+                if metrics.enabled:
+                    metrics.record(entry)
+            continue
+
+        jobs = []
+        for stage in ready:
+            pending.remove(stage)
+            absent = [name for name in stage.inputs if name in results.missing]
+            if absent:
+                print(f"❌ Skipping {stage.name}: no {', '.join(absent)}")
+                results.missing.update(stage.outputs)
+                continue
+
+            stage_key = stage.key(results.digests)
+            cached = None if force else lookup(stage_key, root)
+            if cached is not None:
+                for name in stage.outputs:
+                    if cached.get(name) is None:
+                        results.missing.add(name)
+                    else:
+                        results.digests[name] = cached[name]
+                results.cached.append(stage.name)
+                continue
+            jobs.append((stage, stage_key))
+
+        for stage, stage_key in jobs:
+            try:
+                args = [results.get(name) for name in stage.inputs]
+            except Exception as e:
+                fail(stage, e)
+                continue
+
+            rows_in = rows(args[0]) if args else None
+            if pool is not None and (len(jobs) > 1 or running):
+                # Workers time themselves so the report shows the stage's own wall/CPU, not queueing
+                entry = metrics.new_record(stage.name, rows_in=rows_in)
+                running[pool.submit(metrics.timed_call, stage.func, *args)] = (stage, stage_key, entry)
+                continue
+
+            with metrics.stage(stage.name, rows_in=rows_in) as stats:
+                try:
+                    stats["rows_out"] = finish(stage, stage_key, stage.func(*args))
+                except Exception as e:
+                    fail(stage, e)
+
+    if results.cached:
+        print(f"♻️ Reused {len(results.cached)} cached stage(s): {', '.join(results.cached)}")
+    return results
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from scripts import records
+
+# Variant expansion shared by the device processors.
+#
+# A processor reduces its section to one "base" row per priced input row, then describes the
+# output rows it wants per base row as a list of variant dicts:
+#
+#   {"slot": "sealed", "Box Status": "Sealed"}                  # price taken from base["sealed"]
+#   {"slot": "sealed", "when": "has_flex", "adjust": "flex",    # only where base["has_flex"],
+#    "sign": 1, "Carrier": "Flex"}                               # price + base["flex"]
+#
+# Any other key overrides that output column; columns a variant doesn't name come from the base row.
+# Output rows are ordered by base row, then by variant, exactly like nested loops would emit them.
+
+def carry_forward(values, resets=None):
+    # State after each row of a loop that sets the state wherever `values` is not NaN and then
+    # clears it wherever `resets` is True (a reset on the same row as a set wins, since it runs later)
+    positions = np.arange(len(values))
+    last_set = np.maximum.accumulate(np.where(values.notna().to_numpy(), positions, -1))
+    if resets is None:
+        last_reset = np.full(len(values), -1)
+    else:
+        last_reset = np.maximum.accumulate(np.where(resets.to_numpy(dtype=bool), positions, -1))
+
+    state = pd.Series(values.to_numpy()[np.maximum(last_set, 0)], index=values.index)
+    return state.where(last_set > last_reset)
+
+def expand(base, variants, columns, price="Price"):
+    # Cross base rows with variants, keep the rows each variant applies to, price them and
+    # return a frame with `columns` in order
+    n, m = len(base), len(variants)
+    rows = np.repeat(np.arange(n), m)
+    kinds = np.tile(np.arange(m), n)
+
+    keep = np.ones((n, m), dtype=bool)
+    for j, variant in enumerate(variants):
+        if "when" in variant:
+            keep[:, j] = base[variant["when"]].to_numpy(dtype=bool)
+    keep = keep.ravel()
+    rows, kinds = rows[keep], kinds[keep]
+
+    out = {}
+    for col in columns:
+        if col == price:
+            out[col] = variant_prices(base, variants, rows, kinds)
+            continue
+
+        values = base[col].to_numpy(dtype=object)[rows] if col in base else np.full(len(rows), None, dtype=object)
+        overridden = np.array([col in variant for variant in variants], dtype=bool)
+        if overridden.any():
+            fixed = np.array([variant.get(col) for variant in variants], dtype=object)
+            values = np.where(overridden[kinds], fixed[kinds], values)
+        out[col] = values
+
+    return records.to_frame(out, columns)
+
+def variant_prices(base, variants, rows, kinds):
+    # Base slot price plus the signed modifier of each variant; integer slots stay integers
+    slots = [variant["slot"] for variant in variants]
+    integer = all(pd.api.types.is_integer_dtype(base[slot]) for slot in slots)
+
+    prices = np.zeros(len(rows), dtype=float)
+    for j, variant in enumerate(variants):
+        mine = kinds == j
+        if not mine.any():
+            continue
+        picked = rows[mine]
+        value = base[variant["slot"]].to_numpy(dtype=float)[picked]
+        if "adjust" in variant:
+            value = value + variant.get("sign", 1) * base[variant["adjust"]].to_numpy(dtype=float)[picked]
+        prices[mine] = value
+
+    return prices.astype("int64") if integer else prices
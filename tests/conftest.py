@@ -0,0 +1,50 @@
+import os
+import uuid
+
+import psycopg2
+import pytest
+
+from scripts import loader
+
+# Postgres tests run against TEST_DATABASE_URL and leave nothing behind
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+DEVICES_COLUMNS = """
+    box_status text, category text, make text, model text, storage text, color text,
+    grade text, lock_status text, active_status text, carrier text, price numeric,
+    serial_number text, fetched_at date
+"""
+
+@pytest.fixture
+def cursor():
+    # A cursor inside a transaction that is rolled back
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    try:
+        with conn.cursor() as cursor:
+            yield cursor
+    finally:
+        conn.rollback()
+        conn.close()
+        loader.forget_cached_state()
+
+@pytest.fixture
+def database_url():
+    # For code that opens and commits its own connections: a throwaway schema with a devices table,
+    # first on the search_path of every connection made with the returned URL
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    schema = "pytest_" + uuid.uuid4().hex[:8]
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            cursor.execute(f"CREATE TABLE {schema}.devices ({DEVICES_COLUMNS})")
+        yield TEST_DATABASE_URL + ("&" if "?" in TEST_DATABASE_URL else "?") + f"options=-csearch_path%3D{schema}"
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.close()
+        loader.forget_cached_state()
@@ -0,0 +1,21 @@
+from datetime import date
+
+from run_pipeline import backfill_date
+
+TODAY = date(2025, 1, 2)
+
+def test_date_with_year():
+    assert backfill_date("archive/hanggroup-18-october-2024-price-list.html", TODAY) == date(2024, 10, 18)
+
+def test_date_without_year_is_not_in_the_future():
+    assert backfill_date("https://x/?u=1&id=abc-1-january-list", TODAY) == date(2025, 1, 1)
+    assert backfill_date("https://x/?u=1&id=abc-18-oct-list", TODAY) == date(2024, 10, 18)
+
+def test_29_february_without_year_goes_back_to_a_leap_year():
+    assert backfill_date("https://x/?u=1&id=abc-29-february-list", TODAY) == date(2024, 2, 29)
+    assert backfill_date("https://x/?u=1&id=abc-29-february-list", date(2024, 2, 1)) == date(2020, 2, 29)
+
+def test_no_date():
+    assert backfill_date("archive/price-list.html", TODAY) is None
+    assert backfill_date("https://x/?u=1&id=abc-30-february-list", TODAY) is None
+    assert backfill_date("https://x/?u=1&id=abc-30-february-2024-list", TODAY) is None
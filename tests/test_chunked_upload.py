@@ -0,0 +1,106 @@
+from datetime import date
+
+import pandas as pd
+import psycopg2
+import pytest
+
+import run_pipeline
+from scripts import checkpoint
+
+FETCHED_AT = date(2024, 10, 18)
+SETTINGS = {"chunk_size": 2, "upload_mode": "copy", "load_mode": "append"}
+
+def frame(models):
+    return pd.DataFrame({"Make": "Apple", "Model": models, "Price": range(100, 100 + len(models))})
+
+def test_chunk_frame():
+    df = frame(["11", "12", "13", "14", "15"])
+    assert [chunk["Model"].tolist() for chunk in run_pipeline.chunk_frame(df, 2, "append")] == \
+        [["11", "12"], ["13", "14"], ["15"]]
+    assert [len(chunk) for chunk in run_pipeline.chunk_frame(df, 5, "encoded")] == [5]
+    assert [len(chunk) for chunk in run_pipeline.chunk_frame(df, 0, "append")] == [5]
+    # Wide files are pivoted and delta files delisted as a whole
+    assert [len(chunk) for chunk in run_pipeline.chunk_frame(df, 2, "wide")] == [5]
+    assert [len(chunk) for chunk in run_pipeline.chunk_frame(df, 2, "delta")] == [5]
+    assert run_pipeline.chunk_frame(df.iloc[:0], 2, "append") == []
+
+def test_same_run():
+    keys = {"processed/a": "k1", "processed/b": "k2"}
+    manifest = {"fetched_at": FETCHED_AT.isoformat(), "settings": dict(SETTINGS), "upload_keys": dict(keys)}
+    assert checkpoint.same_run(manifest, FETCHED_AT, SETTINGS, keys)
+    assert not checkpoint.same_run(manifest, date(2024, 10, 19), SETTINGS, keys)
+    assert not checkpoint.same_run(manifest, FETCHED_AT, {**SETTINGS, "chunk_size": 3}, keys)
+    assert not checkpoint.same_run(manifest, FETCHED_AT, SETTINGS, {**keys, "processed/b": "k3"})
+
+@pytest.fixture
+def chunked(database_url, tmp_path, monkeypatch):
+    # Chunked uploads of 2 rows into the test schema, with the manifest and processed files in tmp_path
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(run_pipeline, "DATABASE_URL", database_url)
+    monkeypatch.setattr(run_pipeline, "UPLOAD_CHUNK_SIZE", 2)
+    monkeypatch.setattr(run_pipeline, "UPLOAD_MODE", "copy")
+    monkeypatch.setattr(run_pipeline, "LOAD_MODE", "append")
+
+    def loaded():
+        conn = psycopg2.connect(database_url)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT model, count(*) FROM devices GROUP BY model ORDER BY model")
+                return cursor.fetchall()
+        finally:
+            conn.close()
+    return loaded
+
+def fail_on_load(monkeypatch, call):
+    # The call-th chunk load raises, like a dropped connection
+    load_prepared = run_pipeline.load_prepared
+    calls = []
+
+    def flaky(*args):
+        calls.append(args)
+        if len(calls) == call:
+            raise RuntimeError("server closed the connection unexpectedly")
+        return load_prepared(*args)
+    monkeypatch.setattr(run_pipeline, "load_prepared", flaky)
+    return calls
+
+OUTPUTS = {"processed/a": frame(["11", "12", "13"]), "processed/b": frame(["14", "15"])}
+KEYS = {"processed/a": "key-a", "processed/b": "key-b"}
+EVERY_MODEL_ONCE = [(model, 1) for model in ["11", "12", "13", "14", "15"]]
+
+def upload(outputs, keys):
+    run = {"fetched_at": FETCHED_AT, "upload_keys": keys, "page_hash": "page", "extractor_cache": {}}
+    return run_pipeline.upload_postgres(outputs, run)
+
+def test_rerun_continues_an_interrupted_upload(chunked, monkeypatch):
+    fail_on_load(monkeypatch, 3)
+    assert upload(OUTPUTS, KEYS) is None
+    assert chunked() == [("11", 1), ("12", 1), ("13", 1)]
+    run_id = checkpoint.load_manifest()["run_id"]
+
+    # The next run with the same frames picks up at processed/b instead of loading a again
+    calls = fail_on_load(monkeypatch, 0)
+    assert upload(OUTPUTS, KEYS) == list(OUTPUTS)
+    assert [args[1] for args in calls] == ["processed/b"]
+    assert chunked() == EVERY_MODEL_ONCE
+    assert checkpoint.load_manifest() is None
+
+    conn = psycopg2.connect(run_pipeline.DATABASE_URL)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT run_id FROM upload_checkpoints")
+        assert cursor.fetchall() == [(run_id,)]
+    conn.close()
+
+def test_other_upload_waits_for_resume(chunked, monkeypatch):
+    fail_on_load(monkeypatch, 2)
+    assert upload(OUTPUTS, KEYS) is None
+    assert chunked() == [("11", 1), ("12", 1)]
+
+    # A different price list doesn't start over on top of the committed chunks
+    fail_on_load(monkeypatch, 0)
+    assert upload({"processed/c": frame(["16"])}, {"processed/c": "key-c"}) is None
+    assert chunked() == [("11", 1), ("12", 1)]
+
+    run_pipeline.resume()
+    assert chunked() == EVERY_MODEL_ONCE
+    assert checkpoint.load_manifest() is None
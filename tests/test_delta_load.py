@@ -0,0 +1,50 @@
+from datetime import date
+
+import pandas as pd
+
+from scripts import loader
+
+def price_list(fetched_at, prices):
+    # Prepared delta frame with one row per model
+    rows = [{col: None for col in loader.PRICE_COLUMNS} | {"model": model, "price": price}
+            for model, price in prices.items()]
+    return pd.DataFrame(rows, columns=loader.PRICE_COLUMNS).assign(make="Apple", fetched_at=fetched_at)
+
+def intervals(cursor):
+    cursor.execute("SELECT model, price, valid_from, valid_to, source_file FROM device_prices ORDER BY model, valid_from")
+    return [(model, float(price), valid_from, valid_to, source_file)
+            for model, price, valid_from, valid_to, source_file in cursor.fetchall()]
+
+def test_key_missing_from_the_next_list_is_closed(cursor):
+    cursor.execute("DROP TABLE IF EXISTS device_prices")
+    loader.forget_cached_state()
+    day1, day2 = date(2024, 10, 18), date(2024, 10, 19)
+
+    loader.upsert_delta(cursor, price_list(day1, {"iPhone 13": 300, "iPhone 14": 400}), "iPhone_New_Final")
+    loader.upsert_delta(cursor, price_list(day1, {"Pixel 8": 250}), "google_Final")
+    written, closed, delisted, _ = loader.upsert_delta(
+        cursor, price_list(day2, {"iPhone 14": 380}), "iPhone_New_Final")
+
+    assert (written, closed, delisted) == (1, 1, 1)
+    assert intervals(cursor) == [
+        ("Pixel 8", 250.0, day1, None, "google_Final"),  # another file's keys stay open
+        ("iPhone 13", 300.0, day1, day2, "iPhone_New_Final"),
+        ("iPhone 14", 400.0, day1, day2, "iPhone_New_Final"),
+        ("iPhone 14", 380.0, day2, None, "iPhone_New_Final"),
+    ]
+
+def test_relisted_key_opens_a_new_interval(cursor):
+    cursor.execute("DROP TABLE IF EXISTS device_prices")
+    loader.forget_cached_state()
+    days = [date(2024, 10, 18), date(2024, 10, 19), date(2024, 10, 20)]
+
+    loader.upsert_delta(cursor, price_list(days[0], {"iPhone 13": 300, "iPhone 14": 400}), "iPhone_New_Final")
+    loader.upsert_delta(cursor, price_list(days[1], {"iPhone 14": 400}), "iPhone_New_Final")
+    loader.upsert_delta(cursor, price_list(days[2], {"iPhone 13": 300, "iPhone 14": 400}), "iPhone_New_Final")
+
+    cursor.execute("SELECT model FROM device_prices WHERE valid_to IS NULL ORDER BY model")
+    assert cursor.fetchall() == [("iPhone 13",), ("iPhone 14",)]
+    assert intervals(cursor)[:2] == [
+        ("iPhone 13", 300.0, days[0], days[1], "iPhone_New_Final"),
+        ("iPhone 13", 300.0, days[2], None, "iPhone_New_Final"),
+    ]
@@ -0,0 +1,32 @@
+from datetime import date
+
+import pandas as pd
+
+from scripts import sinks
+from scripts.artifacts import EXPECTED_COLUMNS
+
+def prepared(models, category="Cellphone", fetched_at=date(2024, 10, 18)):
+    df = pd.DataFrame({col: [None] * len(models) for col in EXPECTED_COLUMNS})
+    return df.assign(model=models, category=category, price=100.0, fetched_at=fetched_at)
+
+def models(df, source_file):
+    return sorted(df.loc[df["source_file"] == source_file, "model"])
+
+def test_parquet_rewrite_replaces_only_that_file(tmp_path):
+    root = str(tmp_path / "dataset")
+    # Both files share the fetched_at=2024-10-18/category=Cellphone partition
+    frames = {"processed/iPhone_New_Final": prepared(["13", "14", "15"]),
+              "processed/samsung_Final": prepared(["S24"])}
+    assert sinks.write_parquet(frames, root=root) == list(frames)
+
+    rewrite = {"processed/iPhone_New_Final": prepared(["16"])}
+    assert sinks.write_parquet(rewrite, root=root) == list(rewrite)
+    df = sinks.read_parquet(root)
+    assert models(df, "iPhone_New_Final") == ["16"]
+    assert models(df, "samsung_Final") == ["S24"]
+
+    # Another day's rows stay too
+    sinks.write_parquet({"processed/samsung_Final": prepared(["S25"], fetched_at=date(2024, 10, 19))}, root=root)
+    df = sinks.read_parquet(root)
+    assert sorted(zip(df["fetched_at"].astype(str), df["model"])) == \
+        [("2024-10-18", "16"), ("2024-10-18", "S24"), ("2024-10-19", "S25")]
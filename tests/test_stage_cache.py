@@ -0,0 +1,41 @@
+import os
+import time
+
+from scripts import stages
+
+DAY = 86400
+
+def age(path, days):
+    then = time.time() - days * DAY
+    os.utime(path, (then, then))
+
+def test_prune_drops_unused_keys_and_their_values(tmp_path):
+    root = str(tmp_path)
+    old, kept, shared, loose = (stages.put(value, root) for value in ("old", "kept", "shared", "loose"))
+    stages.record("a" * 64, "parse", {"rows": old, "cleaned": shared}, root)
+    stages.record("b" * 64, "cleaner", {"rows": kept, "cleaned": shared}, root)
+    for digest in (old, kept, shared, loose):
+        age(stages.object_path(digest, root), 40)
+    age(stages.key_path("a" * 64, root), 40)
+    age(stages.key_path("b" * 64, root), 40)
+
+    # Looking a key up counts as using it
+    assert stages.lookup("b" * 64, root) == {"rows": kept, "cleaned": shared}
+    assert stages.prune(30, root) == (1, 2)
+
+    assert stages.lookup("a" * 64, root) is None
+    assert stages.lookup("b" * 64, root) == {"rows": kept, "cleaned": shared}
+    assert [stages.load(digest, root) for digest in (kept, shared)] == ["kept", "shared"]
+    assert not os.path.exists(stages.object_path(old, root))
+    assert not os.path.exists(stages.object_path(loose, root))
+
+def test_prune_keeps_recent_values_without_a_key(tmp_path):
+    # A run going on at the same time may not have recorded the key of a value it just stored
+    root = str(tmp_path)
+    digest = stages.put("fresh", root)
+    assert stages.prune(30, root) == (0, 0)
+    assert stages.load(digest, root) == "fresh"
+
+def test_prune_without_a_cache(tmp_path):
+    assert stages.prune(30, "") == (0, 0)
+    assert stages.prune(30, str(tmp_path / "missing")) == (0, 0)
@@ -0,0 +1,120 @@
+import io
+import random
+
+import pandas as pd
+import pytest
+
+from benchmarks import generator
+from scripts import cleaner
+from scripts import extractor
+from scripts import filer
+
+# STREAM=1 swaps parse_table, filter_rows and split_sections for generators over the page. Both
+# paths have to produce the same rows, sections and warnings.
+
+class Trickle(io.BytesIO):
+    # A stream that returns a few bytes per read, like a slow socket
+    def __init__(self, content, most):
+        super().__init__(content)
+        self.most = most
+
+    def read(self, size=-1):
+        return super().read(min(self.most, size) if size and size > 0 else self.most)
+
+TOKENS = ["<table>", "</table>", "<tr>", "</tr>", "<td>", "</td>", "<th>", "iPhone", "x", " ", "$1",
+          "<script>iPhone</script>", "<p>", "</p>", "<!--c-->", "　", "é"]
+
+PAGES = [
+    b"", b"<html></html>", b"<table><tr><td>iPhone</td></tr></table>",
+    b"<table><tr><td>x</td></tr></table><table><tr><td>a<script>iPhone</script></td></tr>"
+    b"<tr><td>iPhone 1</td><td>$1</td></tr></table>",
+    b"<table><tr><td>head</td></tr><tr><td><table><tr><td>iPhone</td><td>1</td></tr><tr><td>b</td></tr></table>"
+    b"</td><td>z</td></tr><tr><td>tail</td></tr></table><table><tr><td>iPhone2</td></tr></table>",
+    "<div><table><tr><td>iPhone<!-- c --> 1</td><th>　 $5 </th></tr></table></div>".encode(),
+    "﻿<table><tr><td>iPhone café ü</td></tr></table>".encode("utf-8"),
+    '<meta charset="windows-1252"><table><tr><td>iPhone café</td></tr></table>'.encode("cp1252"),
+]
+
+def outcome(parse):
+    try:
+        return list(parse())
+    except ValueError as e:
+        return str(e)
+
+def pages():
+    rng = random.Random(21)
+    yield generator.generate_page(1)
+    yield from PAGES
+    for _ in range(400):
+        yield "".join(rng.choice(TOKENS) for _ in range(rng.randint(1, 40))).encode()
+
+def test_iter_table_rows_matches_parse_table():
+    rng = random.Random(21)
+    for content in pages():
+        expected = outcome(lambda: extractor.parse_table(content))
+        assert outcome(lambda: extractor.iter_table_rows(content)) == expected
+        assert outcome(lambda: extractor.iter_table_rows(io.BytesIO(content))) == expected
+        assert outcome(lambda: extractor.iter_table_rows(Trickle(content, rng.randint(1, 9)))) == expected
+
+def test_page_reader_sees_every_byte():
+    content = generator.generate_page(1)
+    chunks = [content[i:i + 1000] for i in range(0, len(content), 1000)]
+    copy = io.BytesIO()
+    reader = extractor.PageReader(chunks, copy)
+    rows = list(extractor.iter_table_rows(reader))
+    reader.drain()
+    assert rows == extractor.parse_table(content)
+    assert copy.getvalue() == content
+    assert reader.hexdigest() == extractor.hashlib.sha256(content).hexdigest()
+
+CELLS = ["iPhone 15 128GB", "$100", "", "", "x", "Hanggroup", "Price Update", "Galaxy", "  ", "　"]
+
+def random_rows(rng):
+    # Rows with every section header at most once, in any order and case, between random cells
+    headers = rng.sample(filer.section_headers, rng.randint(0, len(filer.section_headers)))
+    rows = []
+    for _ in range(rng.randint(0, 60)):
+        if headers and rng.random() < 0.15:
+            header = headers.pop()
+            rows.append((rng.choice([header, header.upper(), f"  {header} "]),) + ("",) * rng.randint(0, 3))
+        else:
+            rows.append(tuple(rng.choice(CELLS) for _ in range(rng.randint(1, 8))))
+    return rows
+
+def test_route_rows_matches_split_sections(capsys):
+    rng = random.Random(21)
+    for _ in range(100):
+        rows = random_rows(rng)
+        cleaned, dropped = cleaner.filter_rows(extractor.to_frame(rows))
+        sections = filer.split_sections(cleaned)
+        expected_warnings = capsys.readouterr().out
+
+        summary = {}
+        routed = dict(filer.route_rows(cleaner.iter_clean(rows, summary)))
+        assert capsys.readouterr().out == expected_warnings
+        assert cleaner.summarize(pd.DataFrame(summary["dropped"], columns=["phrase", "text"])) == \
+            cleaner.summarize(dropped)
+
+        assert list(routed) == list(sections)
+        for header, section in sections.items():
+            frame = filer.section_frame(routed[header], summary["width"])
+            pd.testing.assert_frame_equal(frame, section)
+
+def test_route_rows_yields_each_section_once_it_closes():
+    read = []
+
+    def rows():
+        for position, row in enumerate([("iPad",), ("a", "$1"), ("MacBook",), ("b", "$2"), ("c", "$3")]):
+            read.append(position)
+            yield position, row
+
+    routed = filer.route_rows(rows())
+    header, section = next(routed)
+    assert header == "ipad"
+    assert section == [(0, ("iPad",)), (1, ("a", "$1"))]
+    assert read == [0, 1, 2]  # the MacBook header closed it; nothing after was read
+
+def test_route_rows_rejects_a_repeated_header():
+    rows = enumerate([("iPad",), ("a",), ("MacBook",), ("iPad",), ("b",)])
+    with pytest.raises(ValueError, match="repeated"):
+        list(filer.route_rows(rows))
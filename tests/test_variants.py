@@ -0,0 +1,235 @@
+import io
+import random
+import re
+
+import numpy as np
+import pandas as pd
+
+from scripts import iphone_new
+from scripts import iphone_used
+from scripts import variants
+
+# The iPhone processors used to build their rows one iterrows() pass at a time. The row loops below
+# are those processors as they were before variants.py, and the vectorized ones must match them.
+
+COLORS = ["Red", "Desert", "Black", "White", "Gold", "Silver", "Blue", "Green", "Purple", "Yellow"]
+
+def loop_iphone_new(df):
+    def is_price(val):
+        if isinstance(val, str):
+            return re.search(r"\$\d+", val)
+        elif isinstance(val, (int, float)):
+            return not pd.isna(val)
+        return False
+
+    def extract_price_num(text):
+        match = re.search(r"\$(-?\d+)", str(text))
+        return int(match.group(1)) if match else 0
+
+    def extract_storage(text):
+        match = re.search(r"(\d+GB|\d+TB)", text, re.IGNORECASE)
+        return match.group(1).upper() if match else None
+
+    def extract_color(text):
+        for color in COLORS:
+            if color.lower() in text.lower():
+                return color
+        return "Other"
+
+    def clean_model(text):
+        text = re.sub(r"iPhone", "", text, flags=re.IGNORECASE)
+        text = re.sub(r"\b(\d+GB|\d+TB)\b", "", text)
+        text = re.sub(rf"\b({'|'.join(COLORS + ['Others'])})\b", "", text, flags=re.IGNORECASE)
+        return re.sub(r"\s+", " ", text).strip()
+
+    records = []
+    current_lock_status = current_flex = current_cricket = current_red = None
+    for _, row in df.iterrows():
+        name = str(row[0]) if pd.notna(row[0]) else ""
+        col4 = str(row[3]) if pd.notna(row[3]) else ""
+        if "flex" in col4.lower():
+            current_flex = extract_price_num(col4)
+        if "cricket" in col4.lower():
+            current_cricket = extract_price_num(col4)
+        if "red" in col4.lower():
+            current_red = extract_price_num(col4)
+
+        if not name.lower().startswith("iphone"):
+            continue
+        if "unlocked" in name.lower():
+            current_lock_status = "Unlocked"
+            continue
+        elif "locked" in name.lower():
+            current_lock_status = "Locked"
+            current_red = None
+            continue
+
+        if is_price(row[1]) and is_price(row[2]):
+            base = {"S.No": "", "Make": "Apple", "Model": clean_model(name), "Storage": extract_storage(name),
+                    "Color": extract_color(name), "Category": "Cellphone", "Grade": "",
+                    "Lock Status": current_lock_status, "Carrier": None}
+            prices = [extract_price_num(row[1]), extract_price_num(row[2])]
+            boxes = [("Sealed", "Non-Active"), ("Unsealed", "Active")]
+
+            def emit(price_of, **fields):
+                for (box, active), price in zip(boxes, prices):
+                    records.append({**base, "Box Status": box, "Activate Status": active, **fields,
+                                    "Price": price_of(price)})
+
+            emit(lambda price: price)
+            if current_lock_status == "Unlocked":
+                current_flex = current_cricket = None
+                if current_red is not None:
+                    emit(lambda price: price - current_red, Color="Red", **{"Lock Status": "Unlocked"})
+            if current_lock_status == "Locked":
+                if current_flex is not None:
+                    emit(lambda price: price + current_flex, Carrier="Flex", **{"Lock Status": "Locked"})
+                if current_cricket is not None:
+                    emit(lambda price: price - current_cricket, Carrier="Cricket", **{"Lock Status": "Locked"})
+    return pd.DataFrame(records, columns=iphone_new.COLUMNS)
+
+def loop_iphone_used(df):
+    def is_price(val):
+        return bool(re.search(r"\$?\d+", str(val)))
+
+    def extract_price_num(text):
+        match = re.search(r"-?\d+", str(text))
+        return int(match.group(0)) if match else 0
+
+    def extract_storage(text):
+        match = re.search(r"\b(\d+(GB|TB))\b", text, re.IGNORECASE)
+        return match.group(1).upper() if match else None
+
+    def extract_lock_status(text):
+        if "unlocked" in text.lower():
+            return "Unlocked"
+        elif "locked" in text.lower():
+            return "Locked"
+        return "-"
+
+    def clean_model(text):
+        text = re.sub(r"\b\d+(GB|TB)\b", "", text, flags=re.IGNORECASE)
+        text = re.sub(r"\bUnlocked\b|\bLocked\b", "", text, flags=re.IGNORECASE)
+        return " ".join(text.strip().split())
+
+    records = []
+    current_flex = current_cricket = None
+    for _, row in df.iterrows():
+        col0 = str(row[0]).strip()
+        col1 = str(row[1]).strip() if pd.notna(row[1]) else ""
+        if "flex" in col0.lower():
+            current_flex = extract_price_num(col0)
+        if "cricket" in col1.lower():
+            current_cricket = extract_price_num(col1)
+        if col0 == "" or col0.lower().startswith("used") or "grade" in col0.lower() or "flex" in col0.lower():
+            continue
+
+        if all(is_price(row[i]) for i in range(1, 7)):
+            lock_status = extract_lock_status(col0)
+            model = clean_model(col0)
+            if model == "0":
+                continue
+            base = {"S.No": "", "Make": "Apple", "Model": model, "Storage": extract_storage(col0), "Color": None,
+                    "Box Status": "Used", "Activate Status": "Active", "Category": "Cellphone"}
+            prices = []
+            for i in range(6):
+                price_val = re.sub(r"[^\d.]", "", str(row[i + 1]))
+                prices.append(float(price_val) if price_val else 0)
+
+            def emit(price_of, lock, carrier):
+                for grade, price in zip(iphone_used.GRADE_LABELS, prices):
+                    records.append({**base, "Grade": grade, "Lock Status": lock, "Carrier": carrier,
+                                    "Price": price_of(price)})
+
+            emit(lambda price: price, lock_status, None)
+            if lock_status == "Unlocked":
+                current_flex = current_cricket = None
+            if lock_status == "Locked":
+                if current_flex is not None:
+                    emit(lambda price: price + current_flex, "Locked", "Flex")
+                if current_cricket is not None:
+                    emit(lambda price: price - current_cricket, "Locked", "Cricket")
+    return pd.DataFrame(records, columns=iphone_used.COLUMNS)
+
+NAMES = [
+    "iPhone Unlocked", "iPhone Locked", "iPhone 15 Pro 256GB Black", "iphone 14 128gb red", "iPhone 13 Blue 1TB",
+    "iPhone 15 Pro Max 256GB Locked", "iPhone 14 128GB Unlocked", "iPhone 12 64GB", "iPhone 15 128gb Others",
+    "iPhone 13 mini 128GB (Locked)", "iPhone 15 Pro Max Desert 1TB Unlocked", "0 Locked", "Used", "Grade Explanation",
+    "Flex +$20", "Flex", "Galaxy S24 256GB", "  ",
+]
+CELLS = ["$100", "$-20", "Flex +$15", "Cricket -$30", "Red -$10", "Flex Cricket $5", "N/A", "-", "", None,
+         "$1,200", "Colored", "12", "$12.5", "free", 250.0, 7, "$0"]
+
+def random_section(rng):
+    rows = [[rng.choice(NAMES + CELLS[:6] + [None])] + [rng.choice(CELLS) for _ in range(6)]
+            for _ in range(rng.randint(1, 25))]
+    df = pd.DataFrame(rows, columns=range(7))
+    df = df.astype(object).where(df.notna(), np.nan)
+    df.index = df.index + rng.randint(0, 50)  # sections are slices of the sheet
+    return df
+
+def canonical(df):
+    # Values as they'd be written out, so int/float/object dtypes don't matter
+    if df.empty:
+        return ""
+    df = pd.read_csv(io.StringIO(df.to_csv(index=False)), dtype=str)
+    df["Price"] = df["Price"].astype(float)
+    return df.to_csv(index=False)
+
+def test_iphone_new_matches_the_row_loop():
+    rng = random.Random(12)
+    for _ in range(150):
+        df = random_section(rng)
+        assert canonical(iphone_new.process(df.copy())) == canonical(loop_iphone_new(df))
+
+def test_iphone_used_matches_the_row_loop():
+    rng = random.Random(12)
+    for _ in range(150):
+        df = random_section(rng)
+        assert canonical(iphone_used.process(df.copy())) == canonical(loop_iphone_used(df))
+
+def test_carry_forward_matches_the_loop():
+    rng = random.Random(12)
+    for _ in range(200):
+        n = rng.randint(0, 30)
+        values = pd.Series([rng.choice([np.nan, np.nan, 5, -3, 20]) for _ in range(n)], dtype=float)
+        resets = pd.Series([rng.random() < 0.2 for _ in range(n)], dtype=bool)
+
+        expected, state = [], None
+        for value, reset in zip(values, resets):
+            if not pd.isna(value):
+                state = value
+            if reset:
+                state = None
+            expected.append(state)
+
+        got = variants.carry_forward(values, resets)
+        assert [None if pd.isna(value) else value for value in got] == expected
+
+def test_expand_matches_nested_loops():
+    base = pd.DataFrame({
+        "Model": ["13", "14", "15"],
+        "Carrier": [None, None, "AT&T"],
+        "sealed": [100, 200, 300],
+        "flex": [10, 0, 5],
+        "has_flex": [True, False, True],
+    })
+    specs = [
+        {"slot": "sealed", "Box Status": "Sealed"},
+        {"slot": "sealed", "when": "has_flex", "adjust": "flex", "sign": 1, "Carrier": "Flex"},
+        {"slot": "sealed", "when": "has_flex", "adjust": "flex", "sign": -1, "Box Status": "Unsealed"},
+    ]
+    columns = ["Model", "Box Status", "Carrier", "Price"]
+
+    expected = []
+    for row in base.to_dict("records"):
+        for spec in specs:
+            if "when" in spec and not row[spec["when"]]:
+                continue
+            price = row[spec["slot"]] + (spec.get("sign", 1) * row[spec["adjust"]] if "adjust" in spec else 0)
+            expected.append([spec.get(col, row.get(col)) for col in columns[:-1]] + [price])
+
+    got = variants.expand(base, specs, columns)
+    assert got["Price"].dtype.kind == "i"
+    assert [[None if pd.isna(value) else value for value in row] for row in got.values.tolist()] == \
+        [[None if pd.isna(value) else value for value in row] for row in expected]
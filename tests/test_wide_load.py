@@ -0,0 +1,71 @@
+import contextlib
+import io
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import run_pipeline
+from benchmarks import generator
+from scripts import cleaner
+from scripts import extractor
+from scripts import filer
+from scripts import loader
+
+FETCHED_AT = date(2024, 10, 18)
+LONG_COLUMNS = loader.PRICE_COLUMNS + ["fetched_at"]
+
+def prepared_outputs():
+    # Every processor's output for a generated price list, prepared for loading
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = extractor.parse_table(generator.generate_page(1))
+        cleaned, _ = cleaner.filter_rows(extractor.to_frame(rows))
+        sections = filer.split_sections(cleaned)
+    return {module.OUTPUT_FILE: run_pipeline.prepare_frame(module.process(sections[module.SECTION]), FETCHED_AT)
+            for module in run_pipeline.PROCESSORS}
+
+def canonical(long):
+    # Long rows as sorted tuples, blanks as None and prices as floats, so row order and dtypes don't matter
+    rows = []
+    for row in long[LONG_COLUMNS].astype(object).itertuples(index=False):
+        row = [None if pd.isna(value) or value == "" else value for value in row]
+        row[LONG_COLUMNS.index("price")] = float(row[LONG_COLUMNS.index("price")])
+        rows.append(tuple(row))
+    return sorted(rows, key=repr)
+
+def expected_long(df):
+    # What the matrix keeps: the last price of each (key, grade), and no row without a price
+    grades = df["grade"].astype(object).where(df["grade"].notna(), "")
+    df = df.assign(grade=grades).drop_duplicates(loader.WIDE_KEY + ["grade"], keep="last")
+    return df[df["price"].notna()]
+
+def test_from_wide_undoes_to_wide():
+    for name, df in prepared_outputs().items():
+        wide = loader.to_wide(df)
+        assert list(wide.columns) == loader.WIDE_COLUMNS
+        assert not wide.duplicated(loader.WIDE_KEY).any(), name
+        assert canonical(loader.from_wide(wide)) == canonical(expected_long(df)), name
+
+def test_repeated_grade_keeps_the_last_price():
+    df = pd.DataFrame({col: [None, None] for col in loader.PRICE_COLUMNS})
+    df = df.assign(make="Apple", model="iPhone 13", grade="A", price=[300, 280], fetched_at=FETCHED_AT)
+    wide = loader.to_wide(df)
+    assert len(wide) == 1
+    assert wide["price_a"].tolist() == [280.0]
+
+def test_unknown_grade_is_rejected():
+    df = pd.DataFrame({col: [None] for col in loader.PRICE_COLUMNS})
+    df = df.assign(make="Apple", grade="Z", price=100, fetched_at=FETCHED_AT)
+    with pytest.raises(ValueError, match="Z"):
+        loader.to_wide(df)
+
+def test_long_view_matches_from_wide(cursor):
+    cursor.execute("DROP TABLE IF EXISTS device_price_matrix CASCADE")
+    loader.forget_cached_state()
+    wide = pd.concat([loader.to_wide(df) for df in prepared_outputs().values()], ignore_index=True)
+    loader.ensure_schema(cursor, loader.WIDE_DDL)
+    loader.copy_frame(cursor, wide, "device_price_matrix")
+
+    cursor.execute(f"SELECT {', '.join(LONG_COLUMNS)} FROM device_price_matrix_long")
+    view = pd.DataFrame(cursor.fetchall(), columns=LONG_COLUMNS)
+    assert canonical(view) == canonical(loader.from_wide(wide))